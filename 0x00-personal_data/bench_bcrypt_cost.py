@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Benchmark of bcrypt hash latency per work factor on this host, and
+of the work factor chosen by calibrate() for a latency budget.
+
+Usage: ./bench_bcrypt_cost.py [target_ms] [max_rounds]
+"""
+import sys
+
+from encrypt_password import calibrate, cost_table
+
+
+if __name__ == "__main__":
+    target = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.25
+    high = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+    print("{:>6} {:>12}".format("cost", "latency ms"))
+    for rounds, elapsed in cost_table(high=high).items():
+        print("{:>6} {:>12.1f}".format(rounds, elapsed * 1000))
+    rounds = calibrate(target)
+    print("calibrated cost for {:.0f} ms: {}".format(target * 1000, rounds))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the cached redaction engines against the
+original filter_datum implementation that recompiled its pattern
+on every call.
+
+The uncached baseline purges re's own pattern cache before each call,
+as happens in a long-running process using more distinct patterns than
+that cache holds; the original implementation is also timed with the
+re cache warm.
+"""
+import random
+import re
+import string
+import sys
+import time
+from typing import List
+
+from filtered_logger import (PII_FIELDS, REDACTION_ENGINES,
+                             get_redaction_engine, filter_datum)
+
+
+def filter_datum_original(
+    fields: List[str],
+    redaction: str,
+    message: str,
+    separator: str
+) -> str:
+    """
+    Returns the redacted message building the pattern on every call,
+    as filter_datum did before the redaction engine was introduced.
+    """
+    pattern = '|'.join([f'(?<={field}=)[^{separator}]+' for field in fields])
+    return re.sub(pattern, redaction, message)
+
+
+def filter_datum_uncached(
+    fields: List[str],
+    redaction: str,
+    message: str,
+    separator: str
+) -> str:
+    """
+    Returns the redacted message like filter_datum_original, after
+    purging re's pattern cache so that the pattern is really compiled.
+    """
+    re.purge()
+    return filter_datum_original(fields, redaction, message, separator)
+
+
+def random_corpus(size: int, seed: int = 0) -> List[str]:
+    """
+    Returns randomly generated key=value log lines mixing PII and
+    non-PII keys, empty values, leading spaces and trailing separators,
+    values containing '=' (`note=password=hunter2`), tokens holding
+    several keys (`name=x email=a@b.c`) and keys ending with a field
+    name (`my_email=`).
+    """
+    rng = random.Random(seed)
+    keys = PII_FIELDS + ("name", "ip", "last_login", "user_agent", "id")
+    alphabet = string.ascii_letters + string.digits + " @.-_:/()!?^~&="
+    corpus = []
+    for _ in range(size):
+        pairs = []
+        for _ in range(rng.randint(0, 12)):
+            value = "".join(rng.choice(alphabet)
+                            for _ in range(rng.randint(0, 20)))
+            roll = rng.random()
+            if roll < 0.1:
+                value += "{}={}".format(rng.choice(keys), value)
+            elif roll < 0.2:
+                value += " {}={}".format(rng.choice(keys), value)
+            key = rng.choice(keys)
+            if rng.random() < 0.05:
+                key = "my_" + key
+            pairs.append("{}{}={}".format(rng.choice(("", " ")), key, value))
+        line = ";".join(pairs)
+        if rng.random() < 0.5:
+            line += ";"
+        corpus.append(line)
+    return corpus
+
+
+def check_equivalence(size: int = 20000) -> None:
+    """
+    Raises AssertionError unless every engine redacts a random corpus
+    exactly like the original filter_datum.
+    """
+    corpus = random_corpus(size)
+    expected = [filter_datum_original(PII_FIELDS, "***", m, ";")
+                for m in corpus]
+    for mode in REDACTION_ENGINES:
+        engine = get_redaction_engine(PII_FIELDS, ";", mode)
+        for message, redacted in zip(corpus, expected):
+            if engine.redact(message) != redacted:
+                raise AssertionError("{} engine redacts {!r} as {!r}, "
+                                     "expected {!r}".format(
+                                         mode, message,
+                                         engine.redact(message), redacted))
+        if engine.redact_many(corpus) != expected:
+            raise AssertionError("{} engine redact_many differs".format(mode))
+
+
+def lines_per_second(func, messages: List[str], repeat: int = 3) -> float:
+    """
+    Returns how many messages per second func redacts, from the best
+    of repeat runs.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(messages)
+        best = min(best, time.perf_counter() - start)
+    return len(messages) / best
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    messages = [
+        "name=user{0};email=user{0}@example.com;phone=(555) 010-{0:04d};"
+        "ssn=123-45-{0:04d};password=secret{0};ip=10.0.0.{1};"
+        "last_login=2019-11-14 06:14:24;user_agent=Mozilla/5.0;"
+        .format(i, i % 255)
+        for i in range(count)
+    ]
+    check_equivalence()
+    engine = get_redaction_engine(PII_FIELDS, ";")
+    tokenizer = get_redaction_engine(PII_FIELDS, ";", "tokenize")
+    candidates = {
+        "uncached filter_datum": lambda msgs: [
+            filter_datum_uncached(PII_FIELDS, "***", m, ";") for m in msgs
+        ],
+        "original, re cache hit": lambda msgs: [
+            filter_datum_original(PII_FIELDS, "***", m, ";") for m in msgs
+        ],
+        "cached filter_datum": lambda msgs: [
+            filter_datum(PII_FIELDS, "***", m, ";") for m in msgs
+        ],
+        "engine.redact": lambda msgs: [engine.redact(m) for m in msgs],
+        "engine.redact_many": engine.redact_many,
+        "tokenizer.redact_many": tokenizer.redact_many,
+    }
+    print("{:<24} {:>14} {:>9}".format("implementation", "lines/second",
+                                       "speedup"))
+    baseline = None
+    for name, func in candidates.items():
+        # compiling on every line is slow: a sample gives its rate
+        sample = messages[:max(1, count // 20)] if baseline is None \
+            else messages
+        rate = lines_per_second(func, sample)
+        baseline = baseline or rate
+        print("{:<24} {:>14,.0f} {:>8.1f}x".format(name, rate,
+                                                   rate / baseline))
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the parallel users export: rows/second and speedup for
+an increasing number of worker processes, using the database set up
+by the PERSONAL_DATA_DB_* environment variables.
+
+Usage: ./bench_parallel_export.py [key] [max_workers]
+"""
+import os
+import sys
+import time
+
+from filtered_logger import export_parallel
+
+
+if __name__ == "__main__":
+    key = sys.argv[1] if len(sys.argv) > 1 else "id"
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    baseline = None
+    print("{:>8} {:>10} {:>14} {:>8}".format(
+        "workers", "rows", "rows/second", "speedup"))
+    workers = 1
+    while workers <= max_workers:
+        with open(os.devnull, 'w') as output:
+            start = time.perf_counter()
+            count = export_parallel(workers, output, key)
+            rate = count / (time.perf_counter() - start)
+        if baseline is None:
+            baseline = rate
+        print("{:>8} {:>10} {:>14,.0f} {:>7.2f}x".format(
+            workers, count, rate, rate / baseline))
+        workers *= 2
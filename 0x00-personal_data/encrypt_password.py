@@ -3,18 +3,30 @@
 Encrypt password module
 """
 
+import asyncio
 import bcrypt
+import threading
+import time
+from concurrent.futures import (Executor, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from typing import Dict, Iterable, List, Optional, Tuple
 
 
-def hash_password(password: str) -> bytes:
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+bcrypt_rounds = 12
+
+
+def hash_password(password: str, rounds: Optional[int] = None) -> bytes:
     """
     Hashes a password using bcrypt and returns the
     salted, hashed password as a byte string.
 
     Arguments:
     password -- the password to hash
+    rounds -- the bcrypt work factor, the calibrated one by default
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds or bcrypt_rounds)
     hashed_password = bcrypt.hashpw(password.encode(), salt)
     return hashed_password
 
@@ -28,3 +40,207 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     password -- the password to validate
     """
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+
+def hash_rounds(hashed_password: bytes) -> int:
+    """
+    Returns the work factor stored in a bcrypt hash ($2b$<cost>$...).
+    """
+    return int(hashed_password.split(b'$')[2])
+
+
+def is_valid_needs_rehash(
+    hashed_password: bytes,
+    password: str
+) -> Tuple[bool, bool]:
+    """
+    Validates the password like is_valid and also tells whether the
+    hash uses a work factor below the current one, so that callers can
+    store hash_password(password) after a successful login. Stronger
+    hashes are kept.
+
+    Returns a (valid, needs_rehash) tuple.
+    """
+    if not is_valid(hashed_password, password):
+        return False, False
+    return True, hash_rounds(hashed_password) < bcrypt_rounds
+
+
+def measure_rounds(rounds: int, samples: int = 3) -> float:
+    """
+    Returns the best time in seconds of hashing a password at the
+    given work factor.
+    """
+    salt = bcrypt.gensalt(rounds)
+    best = float('inf')
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', salt)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(target: float = 0.25, minimum: int = 10) -> int:
+    """
+    Picks the highest work factor whose hash time fits the latency
+    budget on this host, never going below `minimum`, and uses it
+    for the following hash_password calls.
+
+    Each extra round doubles the cost, so the time is measured at a
+    cheap work factor and extrapolated, then checked once.
+
+    Arguments:
+    target -- the latency budget in seconds per hash
+    minimum -- the lowest acceptable work factor
+    """
+    global bcrypt_rounds
+    base = 8
+    elapsed = measure_rounds(base)
+    rounds = base
+    while rounds < MAX_ROUNDS and elapsed * 2 <= target:
+        rounds += 1
+        elapsed *= 2
+    while rounds > MIN_ROUNDS and measure_rounds(rounds, 1) > target:
+        rounds -= 1
+    bcrypt_rounds = max(rounds, minimum)
+    return bcrypt_rounds
+
+
+def cost_table(
+    low: int = MIN_ROUNDS,
+    high: int = 14
+) -> Dict[int, float]:
+    """
+    Returns the measured hash time in seconds for each work factor.
+    """
+    return {rounds: measure_rounds(rounds, 1)
+            for rounds in range(low, high + 1)}
+
+
+class HashingService:
+    """
+    Runs bcrypt hashing and checking on an executor so the calling
+    thread is not held for the duration of each hash.
+
+    At most `max_pending` operations are queued or running at once;
+    submitting more blocks the caller, or raises RuntimeError when
+    `block` is False, so that a burst of logins degrades gracefully
+    instead of piling work up without bound. The async entry points
+    wait for room without blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        use_processes: bool = False,
+        max_pending: int = 64,
+        block: bool = True
+    ):
+        """
+        Creates the executor.
+
+        Arguments:
+        workers -- the number of worker threads or processes
+        use_processes -- use a process pool instead of a thread pool;
+        bcrypt releases the GIL, so threads usually scale as well
+        max_pending -- the maximum number of in-flight operations
+        block -- wait for room instead of failing when full
+        """
+        if use_processes:
+            self.executor: Executor = ProcessPoolExecutor(workers)
+        else:
+            self.executor = ThreadPoolExecutor(workers)
+        self.block = block
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, fn, *args) -> Future:
+        """
+        Submits fn to the executor once a pending slot is available.
+        """
+        if not self._slots.acquire(blocking=self.block):
+            raise RuntimeError("Hashing service is overloaded")
+        return self._start(fn, *args)
+
+    def _start(self, fn, *args) -> Future:
+        """
+        Submits fn to the executor in the pending slot already taken,
+        which is released when it completes.
+        """
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit_hash(self, password: str) -> Future:
+        """
+        Returns a future of the bcrypt hash of the password.
+        """
+        return self._submit(hash_password, password, bcrypt_rounds)
+
+    def submit_verify(self, hashed_password: bytes, password: str) -> Future:
+        """
+        Returns a future telling whether the password matches the hash.
+        """
+        return self._submit(is_valid, hashed_password, password)
+
+    def hash_many(self, passwords: Iterable[str]) -> List[bytes]:
+        """
+        Returns the hashes of the passwords, in the same order.
+        """
+        futures = [self.submit_hash(password) for password in passwords]
+        return [future.result() for future in futures]
+
+    def verify_many(
+        self,
+        pairs: Iterable[Tuple[bytes, str]]
+    ) -> List[bool]:
+        """
+        Returns, for each (hashed_password, password) pair, whether
+        the password matches, in the same order.
+        """
+        futures = [self.submit_verify(hashed, password)
+                   for hashed, password in pairs]
+        return [future.result() for future in futures]
+
+    async def _submit_async(self, fn, *args):
+        """
+        Awaits fn run on the executor; a pending slot is waited for on
+        a thread of the loop's default executor, so other coroutines
+        keep running meanwhile.
+        """
+        if not self._slots.acquire(blocking=False):
+            if not self.block:
+                raise RuntimeError("Hashing service is overloaded")
+            waiter = asyncio.get_event_loop().run_in_executor(
+                None, self._slots.acquire)
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                # the slot is taken anyway once the wait ends
+                waiter.add_done_callback(lambda _: self._slots.release())
+                raise
+        return await asyncio.wrap_future(self._start(fn, *args))
+
+    async def hash_async(self, password: str) -> bytes:
+        """
+        Awaitable variant of hash_password.
+        """
+        return await self._submit_async(hash_password, password,
+                                        bcrypt_rounds)
+
+    async def verify_async(self, hashed_password: bytes,
+                           password: str) -> bool:
+        """
+        Awaitable variant of is_valid.
+        """
+        return await self._submit_async(is_valid, hashed_password,
+                                        password)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shuts the executor down.
+        """
+        self.executor.shutdown(wait=wait)
@@ -3,11 +3,33 @@
 filtered_logger module
 """
 
+import argparse
+import atexit
+import collections
+import contextlib
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import queue
 import re
 import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
 import mysql.connector
-from typing import List
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import (Any, Callable, Iterable, Iterator, List, Optional,
+                    TextIO, Tuple)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 def filter_datum(
@@ -27,8 +49,143 @@ def filter_datum(
     separator -- a string representing by which character is
     separating all fields in the log line (message)
     """
-    pattern = '|'.join([f'(?<={field}=)[^{separator}]+' for field in fields])
-    return re.sub(pattern, redaction, message)
+    return get_redaction_engine(fields, separator).redact(message, redaction)
+
+
+class RedactionEngine:
+    """
+    Redacts the values of a fixed set of fields in log lines
+    with a regular expression compiled once at construction.
+    """
+
+    def __init__(self, fields: Tuple[str, ...], separator: str):
+        """
+        Compiles the redaction pattern for the given fields and separator.
+
+        Arguments:
+        fields -- a tuple of strings representing all fields to obfuscate
+        separator -- a string representing by which character is
+        separating all fields in the log line
+        """
+        self.fields = tuple(fields)
+        self.separator = separator
+        value = '[^{}]+'.format(re.escape(separator))
+        self.pattern = re.compile('|'.join(
+            ['(?<={}=){}'.format(re.escape(field), value)
+             for field in self.fields]
+        ))
+
+    def redact(self, message: str, redaction: str = "***") -> str:
+        """
+        Returns the message with the values of the fields replaced
+        by the redaction string.
+        """
+        if not self.fields:
+            return message
+        return self.pattern.sub(redaction, message)
+
+    def redact_many(
+        self,
+        messages: Iterable[str],
+        redaction: str = "***"
+    ) -> List[str]:
+        """
+        Returns the list of redacted messages, in the same order.
+        """
+        if not self.fields:
+            return list(messages)
+        redact = self.redact
+        return [redact(message, redaction) for message in messages]
+
+
+class TokenizingRedactionEngine(RedactionEngine):
+    """
+    Redacts field values by splitting the log line on the separator
+    once and looking each key up in a set, so the cost depends on the
+    length of the line and not on the number of fields.
+
+    A token the set lookup cannot decide, because its value contains
+    `=` (`note=password=hunter2`) or its key holds more than one key or
+    ends with a field name (`name=x email=a@b.c`, `my_email=`), is
+    redacted with the regex pattern instead, so both engines always
+    return the same line.
+    """
+
+    def __init__(self, fields: Tuple[str, ...], separator: str):
+        """
+        Compiles the fallback pattern and builds the set of field
+        names to look keys up in, with the distinct lengths of those
+        names to find keys ending with one.
+
+        Arguments:
+        fields -- a tuple of strings representing all fields to obfuscate
+        separator -- a string representing by which character is
+        separating all fields in the log line
+        """
+        super().__init__(fields, separator)
+        self.field_set = frozenset(self.fields)
+        self.field_lengths = tuple(sorted({len(f) for f in self.fields}))
+
+    def redact(self, message: str, redaction: str = "***") -> str:
+        """
+        Returns the message with the values of the fields replaced
+        by the redaction string.
+        """
+        if not self.fields:
+            return message
+        field_set = self.field_set
+        field_lengths = self.field_lengths
+        tokens = message.split(self.separator)
+        for i, token in enumerate(tokens):
+            key, eq, value = token.partition('=')
+            if not value:
+                continue
+            if '=' in value:
+                tokens[i] = self.pattern.sub(redaction, token)
+            elif key.lstrip() in field_set:
+                tokens[i] = key + eq + redaction
+            else:
+                for length in field_lengths:
+                    if key[-length:] in field_set:
+                        tokens[i] = self.pattern.sub(redaction, token)
+                        break
+        return self.separator.join(tokens)
+
+
+REDACTION_ENGINES = {
+    "regex": RedactionEngine,
+    "tokenize": TokenizingRedactionEngine,
+}
+
+
+@lru_cache(maxsize=int(os.getenv('PERSONAL_DATA_REDACTION_CACHE', '32')))
+def _cached_engine(
+    fields: Tuple[str, ...],
+    separator: str,
+    mode: str
+) -> RedactionEngine:
+    """
+    Returns the compiled engine for a hashable fields tuple.
+    """
+    return REDACTION_ENGINES[mode](fields, separator)
+
+
+def get_redaction_engine(
+    fields: Iterable[str],
+    separator: str,
+    mode: str = "regex"
+) -> RedactionEngine:
+    """
+    Returns a compiled redaction engine for the fields and separator,
+    reusing it from a bounded LRU cache when one was already built.
+
+    Arguments:
+    mode -- "regex" for the lookbehind pattern or "tokenize" for
+    the single-pass key lookup
+    """
+    if mode not in REDACTION_ENGINES:
+        raise ValueError("Unknown redaction mode: {}".format(mode))
+    return _cached_engine(tuple(fields), separator, mode)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -39,41 +196,274 @@ class RedactingFormatter(logging.Formatter):
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
+    def __init__(self, fields: List[str], mode: str = "regex"):
         """ Redacting Formatter class
+
+        Arguments:
+        fields -- the fields whose values are redacted
+        mode -- the redaction engine, "regex" or "tokenize"
         """
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.engine = get_redaction_engine(fields, self.SEPARATOR, mode)
 
     def format(self, record: logging.LogRecord) -> str:
         """ Redacting Formatter class
         """
-        record.msg = filter_datum(
-            self.fields,
-            self.REDACTION,
-            record.msg,
-            self.SEPARATOR
-        )
+        record.msg = self.engine.redact(record.msg, self.REDACTION)
         return super(RedactingFormatter, self).format(record)
 
 
+def dumps_json(obj: Any) -> str:
+    """
+    Serializes obj to a compact JSON string, using orjson when it is
+    installed and the standard json module otherwise; non-string
+    keys are converted by both, as json does.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=str,
+                            option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(',', ':'), default=str)
+
+
+class StructuredRedactingFormatter(logging.Formatter):
+    """ Redacting Formatter for records whose message is a mapping,
+    emitting one JSON object per line
+    """
+
+    REDACTION = RedactingFormatter.REDACTION
+
+    def __init__(self, fields: List[str]):
+        """ Structured Redacting Formatter class
+
+        Arguments:
+        fields -- the keys whose values are redacted, at any depth
+        """
+        super(StructuredRedactingFormatter, self).__init__()
+        self.fields = fields
+        self.field_set = frozenset(fields)
+        self.engine = get_redaction_engine(fields,
+                                           RedactingFormatter.SEPARATOR)
+
+    def redact(self, value: Any) -> Any:
+        """
+        Returns a copy of value where the values of the PII keys of
+        every nested mapping are replaced by the redaction string.
+        """
+        if isinstance(value, Mapping):
+            return {
+                key: self.REDACTION if key in self.field_set
+                else self.redact(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, (list, tuple)):
+            return [self.redact(item) for item in value]
+        return value
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Returns the record as a JSON line. Mapping messages are redacted
+        by key lookup; text messages fall back to the key=value engine.
+        """
+        if isinstance(record.msg, Mapping):
+            message = self.redact(record.msg)
+        else:
+            message = self.engine.redact(record.getMessage(), self.REDACTION)
+        entry = {
+            "name": record.name,
+            "level": record.levelname,
+            "time": self.formatTime(record),
+            "message": message,
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return dumps_json(entry)
+
+
 PII_FIELDS = ("email", "phone", "ssn", "password", "date_of_birth")
 
 
-def get_logger() -> logging.Logger:
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that pushes raw records onto a bounded queue so that
+    redaction and I/O happen on the listener thread, applying an
+    overflow policy when the queue is full.
+    """
+
+    OVERFLOW_POLICIES = ("block", "drop-oldest", "sample")
+
+    def __init__(
+        self,
+        queue_size: int = 10000,
+        overflow: str = "block",
+        sample_rate: int = 10
+    ):
+        """
+        Creates the handler and its bounded queue.
+
+        Arguments:
+        queue_size -- the maximum number of pending records
+        overflow -- what to do when the queue is full: "block" waits
+        for room, "drop-oldest" discards the oldest pending record and
+        "sample" keeps one overflowing record out of sample_rate, in
+        place of the oldest pending one; no policy but "block" ever
+        waits
+        sample_rate -- the sampling ratio of the "sample" policy
+        """
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: {}".format(overflow))
+        super(BoundedQueueHandler, self).__init__(
+            queue.Queue(maxsize=queue_size)
+        )
+        self.overflow = overflow
+        self.sample_rate = max(1, sample_rate)
+        self.queued = 0
+        self.dropped = 0
+        self._overflowed = 0
+        self._counter_lock = threading.Lock()
+        self.listener = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Returns the record untouched: formatting is left to the
+        handlers of the listener thread.
+        """
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Puts the record on the queue, applying the overflow policy
+        when the queue is full.
+        """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if not self._enqueue_full(record):
+                with self._counter_lock:
+                    self.dropped += 1
+                return
+        with self._counter_lock:
+            self.queued += 1
+
+    def _enqueue_full(self, record: logging.LogRecord) -> bool:
+        """
+        Applies the overflow policy to a record that did not fit and
+        returns whether it was queued.
+        """
+        if self.overflow == "block":
+            self.queue.put(record)
+            return True
+        if self.overflow == "sample":
+            with self._counter_lock:
+                self._overflowed += 1
+                keep = self._overflowed % self.sample_rate == 0
+            if not keep:
+                return False
+        self._replace_oldest(record)
+        return True
+
+    def _replace_oldest(self, record: logging.LogRecord) -> None:
+        """
+        Queues the record without blocking, discarding the oldest
+        pending records until it fits.
+        """
+        while True:
+            try:
+                self.queue.get_nowait()
+                with self._counter_lock:
+                    self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                continue
+
+    def stats(self) -> dict:
+        """
+        Returns the queued, dropped and pending record counters.
+        """
+        with self._counter_lock:
+            return {
+                "queued": self.queued,
+                "dropped": self.dropped,
+                "pending": self.queue.qsize(),
+            }
+
+
+class _BlockingQueueListener(logging.handlers.QueueListener):
+    """
+    Queue listener whose stop sentinel waits for room in a bounded queue.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        """
+        Blocks until the stop sentinel fits in the queue.
+        """
+        self.queue.put(self._sentinel)
+
+
+# arguments get_logger configured each logger with
+_LOGGER_CONFIGS = {}
+
+
+def get_logger(
+    asynchronous: bool = False,
+    queue_size: int = 10000,
+    overflow: str = "block",
+    sample_rate: int = 10,
+    structured: bool = False
+) -> logging.Logger:
     """
     Returns a logger object named 'user_data'
     with specific configurations.
+
+    The logger is configured only once: later calls with the same
+    arguments return it as is, and calls asking for another
+    configuration raise ValueError instead of silently getting the
+    first one.
+
+    Arguments:
+    asynchronous -- redact and write records on a background thread
+    fed by a BoundedQueueHandler instead of in the calling thread
+    queue_size, overflow, sample_rate -- see BoundedQueueHandler
+    structured -- emit JSON lines with StructuredRedactingFormatter
     """
     logger = logging.getLogger("user_data")
+    config = {"asynchronous": asynchronous, "structured": structured}
+    if asynchronous:
+        config.update(queue_size=queue_size, overflow=overflow,
+                      sample_rate=sample_rate)
+    if logger.handlers:
+        configured = _LOGGER_CONFIGS.get(logger.name, config)
+        if configured != config:
+            raise ValueError(
+                "Logger {} is already configured with {}, not {}".format(
+                    logger.name, configured, config))
+        return logger
+    _LOGGER_CONFIGS[logger.name] = config
     logger.setLevel(logging.INFO)
     logger.propagate = False
 
     stream_handler = logging.StreamHandler()
-    formatter = RedactingFormatter(fields=PII_FIELDS)
+    if structured:
+        formatter = StructuredRedactingFormatter(fields=PII_FIELDS)
+    else:
+        formatter = RedactingFormatter(fields=PII_FIELDS)
     stream_handler.setFormatter(formatter)
 
-    logger.addHandler(stream_handler)
+    if not asynchronous:
+        logger.addHandler(stream_handler)
+        return logger
+
+    queue_handler = BoundedQueueHandler(queue_size, overflow, sample_rate)
+    queue_handler.listener = _BlockingQueueListener(
+        queue_handler.queue, stream_handler
+    )
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+    logger.addHandler(queue_handler)
 
     return logger
 
@@ -96,22 +486,407 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     )
 
 
-def main() -> None:
+class ConnectionPool:
     """
-    Main function that retrieves all rows from the 'users' table and logs each row.
+    Thread-safe pool of database connections that keeps up to `size`
+    warm connections, validates them on checkout and recycles them
+    once they are older than `max_age` seconds.
     """
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users;")
-    logger = get_logger()
 
-    for row in cursor:
-        row_str = "; ".join([f"{key}={value}" for key, value in row.items()])
-        logger.info(row_str)
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        size: int = 5,
+        max_age: float = 3600.0,
+        timeout: float = 30.0,
+        validate: Optional[Callable[[Any], bool]] = None
+    ):
+        """
+        Creates an empty pool; connections are opened on demand.
+
+        Arguments:
+        connect -- a callable returning a new connection, e.g. get_db
+        size -- the maximum number of open connections
+        max_age -- the lifetime in seconds after which a connection
+        is closed and replaced on checkout
+        timeout -- how long acquire waits for a free connection
+        validate -- a callable telling whether a connection is still
+        usable, by default its is_connected() method when it has one
+        """
+        self._connect = connect
+        self._validate = validate or self._is_connected
+        self.size = size
+        self.max_age = max_age
+        self.timeout = timeout
+        self._idle = collections.deque()
+        self._born = {}
+        self._open = 0
+        self._cond = threading.Condition()
+        self.in_use = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.recycled = 0
+
+    @staticmethod
+    def _is_connected(conn: Any) -> bool:
+        """
+        Returns whether the connection reports itself as connected.
+        """
+        is_connected = getattr(conn, 'is_connected', None)
+        if is_connected is None:
+            return True
+        try:
+            return bool(is_connected())
+        except Exception:
+            return False
+
+    def _is_usable(self, conn: Any, born: float) -> bool:
+        """
+        Returns whether an idle connection may be handed out again.
+        """
+        if time.monotonic() - born > self.max_age:
+            return False
+        return self._validate(conn)
+
+    def acquire(self) -> Any:
+        """
+        Checks a connection out of the pool, opening a new one when
+        none is idle and the pool is not full, or waiting otherwise.
+
+        Raises TimeoutError when no connection frees up in time.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # the starved checkouts count in the wait stats too
+                    self.waits += 1
+                    self.wait_time += time.monotonic() - start
+                    self.timeouts += 1
+                    raise TimeoutError("No database connection available")
+                waited = True
+                self._cond.wait(remaining)
+            if self._idle:
+                conn, born = self._idle.pop()
+            else:
+                conn, born = None, None
+                self._open += 1
+
+        if conn is not None and not self._is_usable(conn, born):
+            self._close(conn)
+            with self._cond:
+                self.recycled += 1
+            conn = None
+        fresh = conn is None
+        if fresh:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            born = time.monotonic()
+
+        with self._cond:
+            self.created += fresh
+            self._born[id(conn)] = born
+            self.in_use += 1
+            if waited:
+                self.waits += 1
+                self.wait_time += time.monotonic() - start
+        return conn
+
+    def release(self, conn: Any) -> None:
+        """
+        Returns a checked out connection to the pool.
+        """
+        with self._cond:
+            born = self._born.pop(id(conn))
+            self.in_use -= 1
+            self._idle.append((conn, born))
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Context manager checking a connection out for the duration
+        of the block.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @staticmethod
+    def _close(conn: Any) -> None:
+        """
+        Closes a connection, ignoring errors from dead connections.
+        """
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """
+        Closes every idle connection.
+        """
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close(conn)
+                self._open -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """
+        Returns the pool counters: connections in use and idle,
+        how many checkouts had to wait and for how long in total,
+        how many of them timed out, and how many connections were
+        opened and recycled.
+        """
+        with self._cond:
+            return {
+                "in_use": self.in_use,
+                "idle": len(self._idle),
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "recycled": self.recycled,
+            }
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool() -> ConnectionPool:
+    """
+    Returns the process-wide pool of get_db connections, sized from
+    the PERSONAL_DATA_DB_POOL_SIZE, PERSONAL_DATA_DB_POOL_MAX_AGE and
+    PERSONAL_DATA_DB_POOL_TIMEOUT environment variables.
+    """
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = ConnectionPool(
+                get_db,
+                size=int(os.getenv('PERSONAL_DATA_DB_POOL_SIZE', '5')),
+                max_age=float(os.getenv('PERSONAL_DATA_DB_POOL_MAX_AGE',
+                                        '3600')),
+                timeout=float(os.getenv('PERSONAL_DATA_DB_POOL_TIMEOUT',
+                                        '30'))
+            )
+        return _db_pool
 
+
+def stream_rows(
+    db: mysql.connector.connection.MySQLConnection,
+    query: str = "SELECT * FROM users;",
+    batch_size: int = 1000
+) -> Iterator[str]:
+    """
+    Yields every row of the query as a "key=value; ..." log line,
+    reading the result set from an unbuffered cursor in batches so
+    memory stays constant whatever the size of the table.
+
+    Arguments:
+    db -- an open database connection
+    query -- the SELECT statement to export
+    batch_size -- the number of rows fetched per round trip
+    """
+    cursor = db.cursor(buffered=False)
+    try:
+        cursor.execute(query)
+        prefixes = ["{}=".format(name) for name in cursor.column_names]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield "; ".join([prefix + str(value)
+                                 for prefix, value in zip(prefixes, row)])
+    finally:
+        cursor.close()
+
+
+def peak_rss_kb() -> int:
+    """
+    Returns the peak resident set size of the process in kilobytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak // 1024
+    return peak
+
+
+INTEGER_TYPES = ("tinyint", "smallint", "mediumint", "int", "bigint")
+
+
+def check_key_column(
+    db: mysql.connector.connection.MySQLConnection,
+    key: str
+) -> None:
+    """
+    Raises ValueError unless key is an integer column of the users
+    table, which export_parallel needs to partition the rows.
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT DATA_TYPE FROM information_schema.COLUMNS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND "
+                   "TABLE_NAME = 'users' AND COLUMN_NAME = %s;", (key,))
+    row = cursor.fetchone()
     cursor.close()
-    db.close()
+    if row is None:
+        raise ValueError("The users table has no {} column to partition "
+                         "on: pass an integer key with --key, or export "
+                         "with one worker".format(key))
+    data_type = row[0].decode() if isinstance(row[0], bytes) else row[0]
+    if data_type.lower() not in INTEGER_TYPES:
+        raise ValueError("Cannot partition on {} column {}: an integer "
+                         "key is needed".format(data_type, key))
+
+
+def key_ranges(
+    db: mysql.connector.connection.MySQLConnection,
+    key: str,
+    parts: int
+) -> List[Tuple[int, int]]:
+    """
+    Splits the [MIN(key), MAX(key)] span of the users table into
+    contiguous half-open ranges, one per worker.
+
+    Arguments:
+    db -- an open database connection
+    key -- the integer primary key column to partition on
+    parts -- the number of ranges to return
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT MIN({0}), MAX({0}) FROM users;".format(key))
+    low, high = cursor.fetchone()
+    cursor.close()
+    if low is None:
+        return []
+    step = max(1, -(-(high - low + 1) // parts))
+    return [(start, min(start + step, high + 1))
+            for start in range(low, high + 1, step)]
+
+
+def export_shard(args: Tuple[str, int, int, str, int]) -> int:
+    """
+    Worker entry point: redacts the rows of one key range with
+    RedactingFormatter and writes them to a shard file.
+
+    Arguments:
+    args -- the key column, the range bounds, the shard path and
+    the fetchmany batch size
+
+    Returns the number of rows written.
+    """
+    key, start, end, shard_path, batch_size = args
+    formatter = RedactingFormatter(fields=PII_FIELDS)
+    query = "SELECT * FROM users WHERE {0} >= {1} AND {0} < {2} " \
+            "ORDER BY {0};".format(key, int(start), int(end))
+    count = 0
+    db = get_db()
+    try:
+        with open(shard_path, 'w') as shard:
+            for row_str in stream_rows(db, query, batch_size):
+                record = logging.LogRecord("user_data", logging.INFO,
+                                           __file__, 0, row_str, None, None)
+                shard.write(formatter.format(record) + "\n")
+                count += 1
+    finally:
+        db.close()
+    return count
+
+
+def export_parallel(
+    workers: int,
+    output: TextIO,
+    key: str = "id",
+    batch_size: int = 1000
+) -> int:
+    """
+    Exports the users table with one process per primary-key range,
+    each opening its own connection, and merges the shards into the
+    output in key order.
+
+    Returns the number of rows exported; raises ValueError when key
+    is not an integer column of the users table.
+    """
+    if not re.match(r'^\w+$', key):
+        raise ValueError("Invalid key column: {}".format(key))
+    db = get_db()
+    try:
+        check_key_column(db, key)
+        ranges = key_ranges(db, key, workers)
+    finally:
+        db.close()
+
+    shard_dir = tempfile.mkdtemp(prefix="user_data_")
+    try:
+        jobs = [(key, start, end,
+                 os.path.join(shard_dir, "{:06d}.log".format(i)), batch_size)
+                for i, (start, end) in enumerate(ranges)]
+        with multiprocessing.Pool(workers) as pool:
+            count = sum(pool.map(export_shard, jobs, chunksize=1))
+        for job in jobs:
+            with open(job[3], 'r') as shard:
+                shutil.copyfileobj(shard, output)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Main function that retrieves all rows from the 'users' table and logs each row.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="export with N processes partitioned by key")
+    parser.add_argument('--key', default='id',
+                        help="integer key column used to partition rows "
+                             "(the users table of main.sql has none)")
+    args = parser.parse_args(argv)
+    batch_size = int(os.getenv('PERSONAL_DATA_EXPORT_BATCH_SIZE', '1000'))
+
+    start = time.perf_counter()
+    if args.workers > 1:
+        try:
+            count = export_parallel(args.workers, sys.stderr, args.key,
+                                    batch_size)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        db = get_db()
+        logger = get_logger(
+            asynchronous=os.getenv('PERSONAL_DATA_LOG_ASYNC') == '1',
+            queue_size=int(os.getenv('PERSONAL_DATA_LOG_QUEUE_SIZE',
+                                     '10000')),
+            overflow=os.getenv('PERSONAL_DATA_LOG_OVERFLOW', 'block')
+        )
+        count = 0
+        for row_str in stream_rows(db, batch_size=batch_size):
+            logger.info(row_str)
+            count += 1
+        db.close()
+    elapsed = time.perf_counter() - start
+
+    print("exported {} rows in {:.2f}s ({:.0f} rows/s), peak RSS {} kB"
+          .format(count, elapsed, count / elapsed if elapsed else 0,
+                  peak_rss_kb()),
+          file=sys.stderr)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
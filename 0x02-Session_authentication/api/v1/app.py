@@ -7,7 +7,7 @@ from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
 
 from api.v1.views import app_views
-from api.v1.auth.auth import Auth
+from api.v1.auth.auth import Auth, PathMatcher
 from api.v1.auth.basic_auth import BasicAuth
 from api.v1.auth.session_auth import SessionAuth
 from api.v1.auth.session_db_auth import SessionDBAuth
@@ -29,6 +29,13 @@ if auth_type == 'session_exp_auth':
     auth = SessionExpAuth()
 if auth_type == 'session_db_auth':
     auth = SessionDBAuth()
+app.extensions['auth'] = auth
+excluded_paths = PathMatcher([
+    "/api/v1/status/",
+    "/api/v1/unauthorized/",
+    "/api/v1/forbidden/",
+    "/api/v1/auth_session/login/",
+])
 
 
 @app.errorhandler(404)
@@ -57,12 +64,6 @@ def authenticate_user():
     """Authenticates a user before processing a request.
     """
     if auth:
-        excluded_paths = [
-            "/api/v1/status/",
-            "/api/v1/unauthorized/",
-            "/api/v1/forbidden/",
-            "/api/v1/auth_session/login/",
-        ]
         if auth.require_auth(request.path, excluded_paths):
             user = auth.current_user(request)
             if auth.authorization_header(request) is None and \
@@ -3,29 +3,79 @@
 Route module for the API
 """
 from flask import request
-from typing import List, TypeVar
+from typing import Iterable, List, TypeVar, Union
 import os
 
 
-class Auth():
+class PathMatcher():
     """
-    Manage API authentication methods
+    Excluded paths compiled for constant-time matching: exact paths
+    go in a set, wildcard paths (ending with '*') in a prefix trie.
+    Trailing slashes are ignored for exact paths only, so
+    "/api/v1/status" and "/api/v1/status/" match each other while
+    "/api/v1/users/*" does not match "/api/v1/users".
     """
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+
+    _END = ''
+
+    def __init__(self, excluded_paths: Iterable[str]):
         """
-        Checks if authentication is required for the given path.
+        Compiles a list of excluded paths.
         """
-        if path is None or excluded_paths is None:
-            return True
-
+        self.exact = set()
+        self.prefixes = {}
         for excluded_path in excluded_paths:
             if excluded_path.endswith('*'):
-                if path.startswith(excluded_path[:-1]):
-                    return False
-            elif path == excluded_path:
+                node = self.prefixes
+                for char in excluded_path[:-1]:
+                    node = node.setdefault(char, {})
+                node[self._END] = True
+            else:
+                self.exact.add(self.normalize(excluded_path))
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """
+        Returns the path with a single trailing slash.
+        """
+        return path.rstrip('/') + '/'
+
+    def matches(self, path: str) -> bool:
+        """
+        Checks if a path is excluded, in time proportional to the
+        length of the path whatever the number of excluded paths.
+        """
+        if self.normalize(path) in self.exact:
+            return True
+        node = self.prefixes
+        for char in path:
+            if self._END in node:
+                return True
+            node = node.get(char)
+            if node is None:
                 return False
+        return self._END in node
+
 
-        return True
+class Auth():
+    """
+    Manage API authentication methods
+    """
+    def require_auth(
+        self,
+        path: str,
+        excluded_paths: Union[List[str], PathMatcher]
+    ) -> bool:
+        """
+        Checks if authentication is required for the given path;
+        excluded_paths is a list of paths, or a PathMatcher compiled
+        once to skip compiling it on every call.
+        """
+        if path is None or excluded_paths is None:
+            return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = PathMatcher(excluded_paths)
+        return not excluded_paths.matches(path)
 
     def authorization_header(self, request=None) -> str:
         """
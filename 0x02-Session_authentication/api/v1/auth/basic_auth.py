@@ -2,17 +2,154 @@
 """
 Route module for the API
 """
+from collections import OrderedDict
+from os import getenv
 from typing import TypeVar
 import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
 from api.v1.auth.auth import Auth
 from models.user import User
 
 
+class CredentialCache():
+    """
+    Bounded LRU cache with a time to live, mapping a keyed hash of an
+    Authorization header to the id of the user it authenticated.
+
+    Each entry keeps a fingerprint of the user record (email, password
+    hash and update time): an entry whose user was removed or saved
+    since is treated as a miss, so password changes take effect on
+    the next request.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0):
+        """
+        Initializes an empty cache.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    @staticmethod
+    def fingerprint(user: TypeVar('User')) -> tuple:
+        """
+        Returns the attributes of a user that a cached entry depends on.
+        """
+        return (user.email, user.password, user.updated_at)
+
+    def key(self, authorization_header: str) -> bytes:
+        """
+        Returns the keyed hash of an Authorization header, so that no
+        credentials are kept in memory.
+        """
+        return hmac.new(self._key, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def get(self, key: bytes) -> TypeVar('User'):
+        """
+        Returns the user of a live and valid entry, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, fingerprint, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        user = User.get(user_id)
+        if user is None or self.fingerprint(user) != fingerprint:
+            with self._lock:
+                self._entries.pop(key, None)
+                self.invalidations += 1
+            return None
+        return user
+
+    def set(self, key: bytes, user: TypeVar('User')):
+        """
+        Caches the user authenticated by a header, evicting the least
+        recently used entry when full.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (user.id, self.fingerprint(user),
+                                  time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record(self, hit: bool, seconds: float):
+        """
+        Counts a lookup and its latency.
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.hit_seconds += seconds
+            else:
+                self.misses += 1
+                self.miss_seconds += seconds
+
+    def stats(self) -> dict:
+        """
+        Returns the size, hit ratio and mean latencies of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'hit_latency_us': (self.hit_seconds / self.hits * 1e6
+                                   if self.hits else 0.0),
+                'miss_latency_us': (self.miss_seconds / self.misses * 1e6
+                                    if self.misses else 0.0),
+            }
+
+
 class BasicAuth(Auth):
     """
     Basic authentication class that inherits from Auth.
+
+    Authenticated headers are cached (BASIC_AUTH_CACHE_SIZE entries,
+    for BASIC_AUTH_CACHE_TTL seconds) so that a client repeating the
+    same header skips the decoding, search and password check.
     """
 
+    def __init__(self) -> None:
+        """
+        Initializes the credential cache.
+        """
+        super().__init__()
+        self.credential_cache = CredentialCache(
+            int(getenv('BASIC_AUTH_CACHE_SIZE', '10000')),
+            float(getenv('BASIC_AUTH_CACHE_TTL', '60'))
+        )
+
+    def cache_stats(self) -> dict:
+        """
+        Returns the counters of the credential cache.
+        """
+        return self.credential_cache.stats()
+
     def extract_base64_authorization_header(
         self,
         authorization_header: str
@@ -86,11 +223,33 @@ class BasicAuth(Auth):
 
     def current_user(self, request=None) -> TypeVar('User'):
         """
-        Retrieves the User instance for a request.
+        Retrieves the User instance for a request, from the credential
+        cache when the same header was authenticated recently.
         """
         authorization_header = self.authorization_header(request)
         if authorization_header is None:
             return None
+        start = time.perf_counter()
+        cache = self.credential_cache
+        key = cache.key(authorization_header)
+        user = cache.get(key)
+        if user is None:
+            user = self.authenticate_header(authorization_header)
+            if user is not None:
+                cache.set(key, user)
+            cache.record(False, time.perf_counter() - start)
+        else:
+            cache.record(True, time.perf_counter() - start)
+        return user
+
+    def authenticate_header(
+        self,
+        authorization_header: str
+    ) -> TypeVar('User'):
+        """
+        Returns the User instance authenticated by a Basic
+        Authorization header.
+        """
         base64_authorization_header = self.extract_base64_authorization_header(
             authorization_header
         )
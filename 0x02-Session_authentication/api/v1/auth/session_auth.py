@@ -3,14 +3,29 @@
 SessionAuth module for the API
 """
 from api.v1.auth.auth import Auth
+from api.v1.auth.session_backends import session_backend_from_env
 from models.user import User
 import uuid
 
 
 class SessionAuth(Auth):
-    """SessionAuth class for session-based authentication"""
+    """SessionAuth class for session-based authentication
 
-    user_id_by_session_id = {}
+    Sessions are shared by all instances in the SessionBackend chosen
+    by SESSION_BACKEND: by default a thread-safe map of SESSION_SHARDS
+    lock-striped shards, private to the process. The backend is created
+    by the first instance, so importing this module has no effect.
+    """
+
+    user_id_by_session_id = None
+
+    def __init__(self) -> None:
+        """Initializes a new SessionAuth instance, creating the shared
+        session backend on first use.
+        """
+        super().__init__()
+        if SessionAuth.user_id_by_session_id is None:
+            SessionAuth.user_id_by_session_id = session_backend_from_env()
 
     def create_session(self, user_id: str = None) -> str:
         """Creates a session ID for a user_id
@@ -69,10 +84,6 @@ class SessionAuth(Auth):
         if request is None:
             return False
         session_id = self.session_cookie(request)
-        if session_id is None:
-            return False
-        user_id = self.user_id_for_session_id(session_id)
-        if user_id is None:
+        if session_id is None or not isinstance(session_id, str):
             return False
-        del self.user_id_by_session_id[session_id]
-        return True
+        return self.user_id_by_session_id.pop_session(session_id)
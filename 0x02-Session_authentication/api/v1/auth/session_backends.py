@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""Session backends shared by the workers of a host.
+
+SESSION_BACKEND selects the store of SessionAuth:
+  - `memory` (default): a ShardedSessionMap private to the process
+  - `shm`: a SharedMemorySessionMap, a hash table in the memory-mapped
+    file SESSION_SHM_PATH
+  - `redis`: a RedisSessionMap talking to SESSION_REDIS_ADDR; a Redis
+    server, or the stand-in started with
+    `python3 -m api.v1.auth.session_backends [host:port]`
+"""
+from os import getenv
+from typing import Iterator, List, Tuple
+import fcntl
+import mmap
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import zlib
+
+from api.v1.auth.session_store import SessionBackend, ShardedSessionMap
+
+
+# serializes the reopening of the tables by the threads of a child
+_REOPEN_LOCK = threading.Lock()
+
+
+class SharedMemorySessionMap(SessionBackend):
+    """Open addressing hash table of session id -> user id in a
+    memory-mapped file: every process mapping the same file sees the
+    same sessions.
+
+    Slots hold a state byte (empty, used or deleted), the key and the
+    value, each up to MAX_LENGTH bytes. Readers take a shared flock on
+    the file and writers an exclusive one (plus a thread lock, since
+    flock does not exclude the threads of a process).
+
+    A full table is rehashed in place when most of its used slots are
+    deleted, and doubled otherwise: the writer grows the file and stores
+    the new capacity in the header, and the other processes remap the
+    file once they see it there.
+    """
+
+    MAGIC = b'SESSMAP1'
+    # magic, capacity, live entries, deleted slots
+    HEADER = struct.Struct('<8sIII')
+    HEADER_SIZE = 64
+    MAX_LENGTH = 64
+    # state, key length, value length, key, value
+    SLOT = struct.Struct('<BBB64s64s')
+    EMPTY, USED, DELETED = 0, 1, 2
+    # share of used and deleted slots above which the table is full
+    MAX_LOAD = 0.9
+
+    def __init__(self, file_path: str, capacity: int = 65536):
+        """Maps the table at file_path, creating it with capacity slots
+        if needed (an existing table keeps its own capacity).
+        """
+        self.file_path = file_path
+        self._open(capacity)
+
+    def _open(self, capacity: int):
+        """Opens and maps the table file in the current process.
+
+        A forked child must not keep the file descriptor of its parent:
+        flock locks belong to the open file description, which parent
+        and child would share, so neither would exclude the other.
+        """
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._fd = os.open(self.file_path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, self.HEADER_SIZE +
+                             capacity * self.SLOT.size)
+                os.pwrite(self._fd,
+                          self.HEADER.pack(self.MAGIC, capacity, 0, 0), 0)
+            self._mm = mmap.mmap(self._fd, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        magic, self.capacity, _, _ = self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC:
+            raise ValueError("Not a session table: {}".format(
+                self.file_path))
+
+    def _reopen_after_fork(self):
+        """Reopens the table when the process forked since it was
+        opened.
+        """
+        with _REOPEN_LOCK:
+            if self._pid == os.getpid():
+                return
+            self._mm.close()
+            os.close(self._fd)
+            self._open(self.capacity)
+
+    def close(self):
+        """Unmaps the table.
+        """
+        self._mm.close()
+        os.close(self._fd)
+
+    def _locked(self, exclusive: bool) -> '_FileLock':
+        """Returns a context manager holding the table lock.
+        """
+        if self._pid != os.getpid():
+            self._reopen_after_fork()
+        return _FileLock(self, exclusive)
+
+    def _header(self) -> Tuple[int, int]:
+        """Returns the numbers of live entries and deleted slots.
+        """
+        return self.HEADER.unpack_from(self._mm, 0)[2:]
+
+    def _set_header(self, count: int, deleted: int):
+        """Stores the numbers of live entries and deleted slots.
+        """
+        self.HEADER.pack_into(self._mm, 0, self.MAGIC, self.capacity,
+                              count, deleted)
+
+    def _offset(self, slot: int) -> int:
+        """Returns the offset of a slot in the file.
+        """
+        return self.HEADER_SIZE + slot * self.SLOT.size
+
+    def _find(self, key: bytes) -> Tuple[int, int]:
+        """Returns the slot holding key (or -1), and the slot where to
+        insert it otherwise (or -1 when the table is full).
+        """
+        free = -1
+        slot = zlib.crc32(key) % self.capacity
+        for _ in range(self.capacity):
+            state, key_len, _, slot_key, _ = self.SLOT.unpack_from(
+                self._mm, self._offset(slot))
+            if state == self.EMPTY:
+                return -1, slot if free < 0 else free
+            if state == self.DELETED:
+                if free < 0:
+                    free = slot
+            elif slot_key[:key_len] == key:
+                return slot, free
+            slot = (slot + 1) % self.capacity
+        return -1, free
+
+    @classmethod
+    def _encode(cls, text: str) -> bytes:
+        """Encodes a key or value, checking its length.
+        """
+        data = text.encode()
+        if len(data) > cls.MAX_LENGTH:
+            raise ValueError("Longer than {} bytes: {!r}".format(
+                cls.MAX_LENGTH, text))
+        return data
+
+    @classmethod
+    def _lookup_key(cls, session_id: str) -> bytes:
+        """Encodes the key of a lookup: a key too long to be stored is
+        a missing session.
+        """
+        data = session_id.encode()
+        if len(data) > cls.MAX_LENGTH:
+            raise KeyError(session_id)
+        return data
+
+    def __setitem__(self, session_id: str, user_id: str):
+        """Creates (or replaces) a session.
+        """
+        key = self._encode(session_id)
+        value = self._encode(user_id)
+        with self._locked(True):
+            count, deleted = self._header()
+            slot, free = self._find(key)
+            if slot < 0:
+                if count + deleted + 1 > self.capacity * self.MAX_LOAD:
+                    if deleted >= count:
+                        self._rehash()
+                    else:
+                        self._grow(2 * self.capacity)
+                    count, deleted = self._header()
+                    slot, free = self._find(key)
+                state = self.SLOT.unpack_from(self._mm,
+                                              self._offset(free))[0]
+                deleted -= state == self.DELETED
+                count += 1
+                slot = free
+            self.SLOT.pack_into(self._mm, self._offset(slot), self.USED,
+                                len(key), len(value), key, value)
+            self._set_header(count, deleted)
+
+    def _rehash(self, entries: List[Tuple[bytes, bytes]] = None):
+        """Reinserts the live entries (read from the table by default)
+        to clear the deleted slots; the exclusive lock must be held.
+        """
+        if entries is None:
+            entries = list(self._entries())
+        self._mm[self.HEADER_SIZE:] = bytes(len(self._mm) -
+                                            self.HEADER_SIZE)
+        self._set_header(0, 0)
+        for key, value in entries:
+            _, free = self._find(key)
+            self.SLOT.pack_into(self._mm, self._offset(free), self.USED,
+                                len(key), len(value), key, value)
+        self._set_header(len(entries), 0)
+
+    def _grow(self, capacity: int):
+        """Resizes the file to capacity slots and reinserts the live
+        entries; the exclusive lock must be held.
+        """
+        entries = list(self._entries())
+        os.ftruncate(self._fd, self.HEADER_SIZE + capacity * self.SLOT.size)
+        self._mm.close()
+        self._mm = mmap.mmap(self._fd, 0)
+        self.capacity = capacity
+        self._rehash(entries)
+
+    def _remap(self):
+        """Maps the file again when another process grew it; the lock
+        must be held.
+        """
+        capacity = self.HEADER.unpack_from(self._mm, 0)[1]
+        if capacity != self.capacity:
+            self._mm.close()
+            self._mm = mmap.mmap(self._fd, 0)
+            self.capacity = capacity
+
+    def __getitem__(self, session_id: str) -> str:
+        """Returns the user id of a session.
+        """
+        key = self._lookup_key(session_id)
+        with self._locked(False):
+            slot, _ = self._find(key)
+            if slot < 0:
+                raise KeyError(session_id)
+            _, _, value_len, _, value = self.SLOT.unpack_from(
+                self._mm, self._offset(slot))
+        return value[:value_len].decode()
+
+    def __delitem__(self, session_id: str):
+        """Destroys a session.
+        """
+        key = self._lookup_key(session_id)
+        with self._locked(True):
+            slot, _ = self._find(key)
+            if slot < 0:
+                raise KeyError(session_id)
+            self._mm[self._offset(slot)] = self.DELETED
+            count, deleted = self._header()
+            self._set_header(count - 1, deleted + 1)
+
+    def _entries(self) -> Iterator[Tuple[bytes, bytes]]:
+        """Iterates over the (key, value) of the used slots; the lock
+        must be held.
+        """
+        for slot in range(self.capacity):
+            state, key_len, value_len, key, value = self.SLOT.unpack_from(
+                self._mm, self._offset(slot))
+            if state == self.USED:
+                yield key[:key_len], value[:value_len]
+
+    def __len__(self) -> int:
+        """Returns the number of sessions.
+        """
+        with self._locked(False):
+            return self._header()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over a snapshot of the session ids.
+        """
+        with self._locked(False):
+            return iter([key.decode() for key, _ in self._entries()])
+
+    def stats(self) -> dict:
+        """Returns the numbers of sessions, deleted slots and slots.
+        """
+        with self._locked(False):
+            count, deleted = self._header()
+        return {'live': count, 'deleted_slots': deleted,
+                'capacity': self.capacity}
+
+
+class _FileLock():
+    """Thread lock plus flock of a SharedMemorySessionMap.
+    """
+
+    def __init__(self, table: SharedMemorySessionMap, exclusive: bool):
+        """Prepares to lock the table.
+        """
+        self.table = table
+        self.operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+
+    def __enter__(self):
+        """Takes the locks.
+        """
+        self.table._lock.acquire()
+        try:
+            fcntl.flock(self.table._fd, self.operation)
+        except BaseException:
+            self.table._lock.release()
+            raise
+        try:
+            self.table._remap()
+        except BaseException:
+            self.__exit__()
+            raise
+
+    def __exit__(self, *args):
+        """Releases the locks.
+        """
+        fcntl.flock(self.table._fd, fcntl.LOCK_UN)
+        self.table._lock.release()
+
+
+def encode_command(*args: str) -> bytes:
+    """Encodes a command as a RESP array of bulk strings.
+    """
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg.encode() if isinstance(arg, str) else arg
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def read_reply(f) -> object:
+    """Reads one RESP value from a buffered socket file.
+    """
+    line = f.readline()
+    if not line:
+        raise ConnectionError("Connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b'+':
+        return rest.decode()
+    if kind == b'-':
+        raise RuntimeError(rest.decode())
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        length = int(rest)
+        if length < 0:
+            return None
+        data = f.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(rest)
+        if length < 0:
+            return None
+        return [read_reply(f) for _ in range(length)]
+    raise RuntimeError("Invalid reply: {!r}".format(line))
+
+
+class RedisSessionMap(SessionBackend):
+    """Sessions kept in a Redis server (or the stand-in of this
+    module) under the key prefix `session:`, with one connection per
+    thread.
+    """
+
+    PREFIX = "session:"
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 6379):
+        """Connects lazily to the server at host:port.
+        """
+        self.address = (host, port)
+        self._local = threading.local()
+
+    def command(self, *args: str) -> object:
+        """Sends a command and returns its reply.
+        """
+        f = getattr(self._local, 'file', None)
+        if f is None:
+            sock = socket.create_connection(self.address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            f = self._local.file = sock.makefile('rwb')
+        try:
+            f.write(encode_command(*args))
+            f.flush()
+            return read_reply(f)
+        except (OSError, ConnectionError):
+            self._local.file = None
+            f.close()
+            raise
+
+    def __setitem__(self, session_id: str, user_id: str):
+        """Creates (or replaces) a session.
+        """
+        self.command("SET", self.PREFIX + session_id, user_id)
+
+    def __getitem__(self, session_id: str) -> str:
+        """Returns the user id of a session.
+        """
+        value = self.command("GET", self.PREFIX + session_id)
+        if value is None:
+            raise KeyError(session_id)
+        return value.decode()
+
+    def __delitem__(self, session_id: str):
+        """Destroys a session.
+        """
+        if not self.pop_session(session_id):
+            raise KeyError(session_id)
+
+    def pop_session(self, session_id: str) -> bool:
+        """Destroys a session if it exists, in one atomic step.
+        """
+        return self.command("DEL", self.PREFIX + session_id) == 1
+
+    def __len__(self) -> int:
+        """Returns the number of sessions.
+        """
+        return len(self._keys())
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over a snapshot of the session ids.
+        """
+        start = len(self.PREFIX)
+        return iter([key.decode()[start:] for key in self._keys()])
+
+    def _keys(self) -> List[bytes]:
+        """Returns the keys of the sessions.
+        """
+        return self.command("KEYS", self.PREFIX + "*")
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """Connection of the Redis stand-in: serves the GET, SET, DEL,
+    EXISTS, KEYS, DBSIZE and PING commands from one shared dict.
+    """
+
+    def handle(self):
+        """Serves the commands of the connection until it closes.
+        """
+        self.connection.setsockopt(socket.IPPROTO_TCP,
+                                   socket.TCP_NODELAY, 1)
+        while True:
+            try:
+                args = read_reply(self.rfile)
+            except (ConnectionError, OSError):
+                return
+            self.wfile.write(self.server.execute(args))
+            self.wfile.flush()
+
+
+class RESPServer(socketserver.ThreadingTCPServer):
+    """Minimal in-memory Redis stand-in for the session backends.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int]):
+        """Binds the server to address.
+        """
+        super().__init__(address, RESPHandler)
+        self.data = {}
+        self.data_lock = threading.Lock()
+
+    def execute(self, args: list) -> bytes:
+        """Runs one command and returns its encoded reply.
+        """
+        if not isinstance(args, list) or not args:
+            return b"-ERR invalid command\r\n"
+        name = args[0].upper()
+        data = self.data
+        with self.data_lock:
+            if name == b'GET' and len(args) == 2:
+                value = data.get(args[1])
+                if value is None:
+                    return b"$-1\r\n"
+                return b"$%d\r\n%s\r\n" % (len(value), value)
+            if name == b'SET' and len(args) == 3:
+                data[args[1]] = args[2]
+                return b"+OK\r\n"
+            if name in (b'DEL', b'EXISTS') and len(args) > 1:
+                found = sum(key in data for key in args[1:])
+                if name == b'DEL':
+                    for key in args[1:]:
+                        data.pop(key, None)
+                return b":%d\r\n" % found
+            if name == b'KEYS' and len(args) == 2:
+                # only prefix patterns are supported
+                prefix = args[1].rstrip(b'*')
+                keys = [key for key in data if key.startswith(prefix)]
+                return encode_command(*keys)
+            if name == b'DBSIZE':
+                return b":%d\r\n" % len(data)
+            if name == b'PING':
+                return b"+PONG\r\n"
+        return b"-ERR unknown command\r\n"
+
+
+def session_backend_from_env() -> SessionBackend:
+    """Returns the session backend selected by SESSION_BACKEND.
+    """
+    backend = getenv('SESSION_BACKEND', 'memory')
+    if backend == 'memory':
+        return ShardedSessionMap(int(getenv('SESSION_SHARDS', '16')))
+    if backend == 'shm':
+        return SharedMemorySessionMap(
+            getenv('SESSION_SHM_PATH', '.sessions.shm'),
+            int(getenv('SESSION_SHM_SLOTS', '65536'))
+        )
+    if backend == 'redis':
+        host, _, port = getenv('SESSION_REDIS_ADDR',
+                               '127.0.0.1:6379').rpartition(':')
+        return RedisSessionMap(host or '127.0.0.1', int(port))
+    raise ValueError("Unknown session backend: {}".format(backend))
+
+
+if __name__ == "__main__":
+    host, _, port = (sys.argv[1] if len(sys.argv) > 1
+                     else '127.0.0.1:6379').rpartition(':')
+    with RESPServer((host or '127.0.0.1', int(port))) as server:
+        server.serve_forever()
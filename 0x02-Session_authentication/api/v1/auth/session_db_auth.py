@@ -2,44 +2,75 @@
 """Session authentication with expiration
 and storage support module for the API.
 """
-from flask import request
 from datetime import datetime, timedelta
+import os
+import uuid
 
+from models.session_gc import SessionCollector
+from models.session_log import SessionLogStorage
 from models.user_session import UserSession
 from .session_exp_auth import SessionExpAuth
 
 
 class SessionDBAuth(SessionExpAuth):
     """Session authentication class with expiration and storage support.
+
+    UserSession objects are kept in a SessionLogStorage: looked up by
+    session id in memory and persisted to the append-only log
+    SESSION_DB_PATH, fsynced in groups (SESSION_DB_SYNC=group, or
+    async / none for weaker durability). Expired sessions are removed
+    every SESSION_GC_INTERVAL seconds and after SESSION_GC_THRESHOLD
+    new sessions. Until the log exists, the sessions of the Base store
+    (.db_UserSession.json and its journal) are imported into it.
     """
 
+    def __init__(self) -> None:
+        """Initializes a new SessionDBAuth instance and loads the
+        stored sessions.
+        """
+        super().__init__()
+        log_path = os.getenv('SESSION_DB_PATH', '.db_UserSession.log')
+        storage = SessionLogStorage(
+            log_path, sync=os.getenv('SESSION_DB_SYNC', 'group'))
+        legacy_sessions = []
+        if not os.path.exists(log_path):
+            UserSession.use_storage(None)
+            UserSession.load_from_file()
+            legacy_sessions = list(UserSession.all())
+        UserSession.use_storage(storage)
+        UserSession.load_from_file()
+        if legacy_sessions:
+            storage.bulk_save(legacy_sessions)
+        self.collector = SessionCollector(
+            self.session_duration,
+            float(os.getenv('SESSION_GC_INTERVAL', '300')),
+            int(os.getenv('SESSION_GC_THRESHOLD', '10000'))
+        )
+
     def create_session(self, user_id=None) -> str:
         """Creates and stores a session id for the user.
         """
-        session_id = super().create_session(user_id)
-        if type(session_id) == str:
-            kwargs = {
-                'user_id': user_id,
-                'session_id': session_id,
-            }
-            user_session = UserSession(**kwargs)
-            user_session.save()
-            return session_id
+        if user_id is None or not isinstance(user_id, str):
+            return None
+        session_id = str(uuid.uuid4())
+        user_session = UserSession(user_id=user_id, session_id=session_id)
+        user_session.save()
+        self.collector.session_created()
+        return session_id
 
     def user_id_for_session_id(self, session_id=None):
         """Retrieves the user id of the user associated with
         a given session id.
         """
-        try:
-            sessions = UserSession.search({'session_id': session_id})
-        except Exception:
+        if session_id is None or not isinstance(session_id, str):
             return None
+        sessions = UserSession.search({'session_id': session_id})
         if len(sessions) <= 0:
             return None
-        cur_time = datetime.now()
+        if self.session_duration <= 0:
+            return sessions[0].user_id
         time_span = timedelta(seconds=self.session_duration)
-        exp_time = sessions[0].created_at + time_span
-        if exp_time < cur_time:
+        if sessions[0].created_at + time_span < datetime.utcnow():
             return None
         return sessions[0].user_id
 
@@ -47,11 +78,17 @@ class SessionDBAuth(SessionExpAuth):
         """Destroys an authenticated session.
         """
         session_id = self.session_cookie(request)
-        try:
-            sessions = UserSession.search({'session_id': session_id})
-        except Exception:
+        if session_id is None or not isinstance(session_id, str):
             return False
+        sessions = UserSession.search({'session_id': session_id})
         if len(sessions) <= 0:
             return False
         sessions[0].remove()
-        return True
\ No newline at end of file
+        return True
+
+    def cache_stats(self) -> dict:
+        """Returns the number of stored sessions and the counters of
+        the expired session collection.
+        """
+        return {'sessions': UserSession.count(),
+                'gc': self.collector.stats()}
@@ -2,50 +2,46 @@
 """Session authentication with expiration module for the API.
 """
 import os
-from flask import request
-from datetime import datetime, timedelta
 
 from .session_auth import SessionAuth
+from .session_store import ExpiringSessionStore
 
 
 class SessionExpAuth(SessionAuth):
     """Session authentication class with expiration.
+
+    Sessions are kept in an ExpiringSessionStore, which evicts them
+    once SESSION_DURATION seconds old; SESSION_MAX_ENTRIES bounds the
+    number of sessions kept (least recently used evicted first) and
+    SESSION_SWEEP_INTERVAL sets the period of the background sweep.
+
+    The store is private to the process: SESSION_BACKEND=shm or redis,
+    which would be silently ignored, is rejected.
     """
 
     def __init__(self) -> None:
         """Initializes a new SessionExpAuth instance.
         """
+        backend = os.getenv('SESSION_BACKEND', 'memory')
+        if backend != 'memory':
+            raise ValueError(
+                "SESSION_BACKEND={} is only supported by SessionAuth"
+                .format(backend))
         super().__init__()
         try:
             self.session_duration = int(os.getenv('SESSION_DURATION', '0'))
         except Exception:
             self.session_duration = 0
+        try:
+            max_entries = int(os.getenv('SESSION_MAX_ENTRIES', '0'))
+            sweep_interval = float(os.getenv('SESSION_SWEEP_INTERVAL', '60'))
+        except ValueError:
+            max_entries, sweep_interval = 0, 60
+        self.user_id_by_session_id = ExpiringSessionStore(
+            self.session_duration, max_entries, sweep_interval
+        )
 
-    def create_session(self, user_id=None):
-        """Creates a session id for the user.
-        """
-        session_id = super().create_session(user_id)
-        if type(session_id) != str:
-            return None
-        self.user_id_by_session_id[session_id] = {
-            'user_id': user_id,
-            'created_at': datetime.now(),
-        }
-        return session_id
-
-    def user_id_for_session_id(self, session_id=None) -> str:
-        """Retrieves the user id of the user associated with
-        a given session id.
+    def cache_stats(self) -> dict:
+        """Returns the live and evicted session counters.
         """
-        if session_id in self.user_id_by_session_id:
-            session_dict = self.user_id_by_session_id[session_id]
-            if self.session_duration <= 0:
-                return session_dict['user_id']
-            if 'created_at' not in session_dict:
-                return None
-            cur_time = datetime.now()
-            time_span = timedelta(seconds=self.session_duration)
-            exp_time = session_dict['created_at'] + time_span
-            if exp_time < cur_time:
-                return None
-            return session_dict['user_id']
\ No newline at end of file
+        return self.user_id_by_session_id.stats()
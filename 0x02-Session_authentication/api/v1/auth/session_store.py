@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Session store module for the API.
+"""
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from typing import Iterator
+import threading
+import time
+import weakref
+
+
+class SessionBackend(MutableMapping):
+    """Interface of the session stores of SessionAuth: a mapping of
+    session id -> user id, safe to use from several threads.
+    """
+
+    def pop_session(self, session_id: str) -> bool:
+        """Destroys a session if it exists, in one atomic step.
+        """
+        try:
+            del self[session_id]
+        except KeyError:
+            return False
+        return True
+
+    def stats(self) -> dict:
+        """Returns the counters of the store.
+        """
+        return {'live': len(self)}
+
+
+class ShardedSessionMap(SessionBackend):
+    """Thread-safe mapping of session id -> user id split into lock
+    striped shards: operations on sessions of different shards do not
+    wait for each other, and each operation is atomic.
+    """
+
+    def __init__(self, shards: int = 16):
+        """Initializes an empty map of `shards` shards (rounded up to
+        a power of two).
+        """
+        size = 1
+        while size < shards:
+            size *= 2
+        self._mask = size - 1
+        self._shards = [{} for _ in range(size)]
+        self._locks = [threading.Lock() for _ in range(size)]
+
+    def _shard(self, session_id: str) -> int:
+        """Returns the index of the shard of a session id.
+        """
+        return hash(session_id) & self._mask
+
+    def __setitem__(self, session_id: str, user_id: str):
+        """Creates (or replaces) a session.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            self._shards[i][session_id] = user_id
+
+    def __getitem__(self, session_id: str) -> str:
+        """Returns the user id of a session.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            return self._shards[i][session_id]
+
+    def __delitem__(self, session_id: str):
+        """Destroys a session.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            del self._shards[i][session_id]
+
+    def pop_session(self, session_id: str) -> bool:
+        """Destroys a session if it exists, in one atomic step.
+        """
+        i = self._shard(session_id)
+        with self._locks[i]:
+            return self._shards[i].pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        """Returns the number of sessions.
+        """
+        return sum(len(shard) for shard in self._shards)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over a snapshot of the session ids.
+        """
+        ids = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                ids.extend(shard)
+        return iter(ids)
+
+    def __repr__(self) -> str:
+        """Returns the sessions represented as a dict.
+        """
+        return repr(dict(self.items()))
+
+
+class ExpiringSessionStore(SessionBackend):
+    """Mapping of session id -> user id whose entries expire
+    `duration` seconds after their creation (never when duration <= 0).
+
+    Sessions all live for the same duration, so they expire in their
+    creation order: a FIFO queue of (expiry time, session id) is the
+    time-ordered expiry structure. Expired sessions are evicted a few
+    at a time by every operation, and all at once by a background
+    sweeper. With max_entries > 0, the least recently used session is
+    evicted when the store is full.
+    """
+
+    # expired sessions evicted by each operation
+    EVICT_PER_OPERATION = 16
+
+    def __init__(self, duration: int = 0, max_entries: int = 0,
+                 sweep_interval: float = 0):
+        """Initializes an empty store; the sweeper thread runs every
+        sweep_interval seconds when it is positive.
+        """
+        self.duration = duration
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._expiries = deque()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.lru_evicted = 0
+        self.destroyed = 0
+        self._stop = threading.Event()
+        if duration > 0 and sweep_interval > 0:
+            threading.Thread(
+                target=self._sweeper,
+                args=(weakref.ref(self), self._stop, sweep_interval),
+                daemon=True
+            ).start()
+
+    @staticmethod
+    def _sweeper(store_ref: weakref.ref, stop: threading.Event,
+                 interval: float):
+        """Sweeps the store every interval seconds until it is closed
+        or garbage collected.
+        """
+        while not stop.wait(interval):
+            store = store_ref()
+            if store is None:
+                return
+            store.sweep()
+            del store
+
+    def close(self):
+        """Stops the sweeper thread.
+        """
+        self._stop.set()
+
+    def _evict_expired(self, now: float, limit: int = None) -> int:
+        """Evicts up to limit expired sessions (all when None), oldest
+        first; the lock must be held.
+        """
+        count = 0
+        expiries = self._expiries
+        while expiries and expiries[0][0] <= now and \
+                (limit is None or count < limit):
+            expires_at, session_id = expiries.popleft()
+            entry = self._entries.get(session_id)
+            # skip sessions destroyed or evicted since they were queued
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[session_id]
+                self.expired += 1
+                count += 1
+        return count
+
+    def sweep(self) -> int:
+        """Evicts every expired session and returns their number.
+        """
+        with self._lock:
+            return self._evict_expired(time.time())
+
+    def __setitem__(self, session_id: str, user_id: str):
+        """Creates (or replaces) a session.
+        """
+        now = time.time()
+        expires_at = now + self.duration if self.duration > 0 else None
+        with self._lock:
+            if self.duration > 0:
+                self._evict_expired(now, self.EVICT_PER_OPERATION)
+                self._expiries.append((expires_at, session_id))
+            self._entries[session_id] = (user_id, expires_at)
+            self._entries.move_to_end(session_id)
+            self.created += 1
+            while 0 < self.max_entries < len(self._entries):
+                self._entries.popitem(last=False)
+                self.lru_evicted += 1
+
+    def __getitem__(self, session_id: str) -> str:
+        """Returns the user id of a live session, marking it as the
+        most recently used.
+        """
+        now = time.time()
+        with self._lock:
+            if self.duration > 0:
+                self._evict_expired(now, self.EVICT_PER_OPERATION)
+            entry = self._entries.get(session_id)
+            if entry is None:
+                raise KeyError(session_id)
+            if entry[1] is not None and entry[1] <= now:
+                del self._entries[session_id]
+                self.expired += 1
+                raise KeyError(session_id)
+            if self.max_entries > 0:
+                self._entries.move_to_end(session_id)
+            return entry[0]
+
+    def __delitem__(self, session_id: str):
+        """Destroys a session.
+        """
+        with self._lock:
+            if self._entries.pop(session_id, None) is None:
+                raise KeyError(session_id)
+            self.destroyed += 1
+
+    def pop_session(self, session_id: str) -> bool:
+        """Destroys a session if it exists and has not expired, in one
+        atomic step.
+        """
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is None:
+                return False
+            if entry[1] is not None and entry[1] <= time.time():
+                self.expired += 1
+                return False
+            self.destroyed += 1
+            return True
+
+    def __len__(self) -> int:
+        """Returns the number of live sessions.
+        """
+        self.sweep()
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over the ids of the live sessions.
+        """
+        self.sweep()
+        with self._lock:
+            return iter(list(self._entries))
+
+    def stats(self) -> dict:
+        """Returns the live and evicted session counters.
+        """
+        with self._lock:
+            return {
+                'live': len(self._entries),
+                'created': self.created,
+                'expired': self.expired,
+                'lru_evicted': self.lru_evicted,
+                'destroyed': self.destroyed,
+            }
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """ Module of Index views
 """
-from flask import jsonify, abort
+from flask import current_app, jsonify, abort
 from api.v1.views import app_views
 
 
@@ -19,10 +19,14 @@ def stats() -> str:
     """ GET /api/v1/stats
     Return:
       - the number of each objects
+      - the counters of the authentication caches, if any
     """
     from models.user import User
     stats = {}
     stats['users'] = User.count()
+    auth = current_app.extensions.get('auth')
+    if hasattr(auth, 'cache_stats'):
+        stats['auth_cache'] = auth.cache_stats()
     return jsonify(stats)
 
 
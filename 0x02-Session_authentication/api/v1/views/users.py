@@ -2,19 +2,77 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import (Response, abort, jsonify, request, stream_with_context,
+                   url_for)
 from models.user import User
-from typing import TypeVar
+from typing import Iterable, Iterator, TypeVar
+
+
+MAX_PAGE_SIZE = 1000
+STREAM_PAGE_SIZE = 1000
+
+
+def users_response(users: Iterable[User]) -> Response:
+    """ JSON list response of users, spliced from their cached JSON
+    fragments instead of serializing the whole list
+    """
+    return Response("[{}]\n".format(",".join(
+        user.to_json_fragment() for user in users
+    )), mimetype='application/json')
+
+
+def stream_users() -> Iterator[str]:
+    """ Yield the JSON list of all User objects, ordered by id, one
+    page of users at a time
+    """
+    yield "["
+    after = None
+    separator = ""
+    while True:
+        users = User.page(after, STREAM_PAGE_SIZE)
+        if not users:
+            break
+        yield separator + ",".join(user.to_json_fragment()
+                                   for user in users)
+        separator = ","
+        after = users[-1].id
+    yield "]"
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: page size, up to MAX_PAGE_SIZE
+      - after: id of the last User of the previous page
+      - stream: 1 to stream the list of all User objects
     Return:
       - list of all User objects JSON represented
+      - with limit or after, one page of User objects ordered by id and
+        a `Link: <...>; rel="next"` header when more may follow
+      - 400 if limit is not a number between 1 and MAX_PAGE_SIZE
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    if request.args.get('stream') in ('1', 'true'):
+        return Response(stream_with_context(stream_users()),
+                        mimetype='application/json')
+    after = request.args.get('after')
+    limit = request.args.get('limit')
+    if after is None and limit is None:
+        return users_response(User.all())
+    try:
+        limit = int(limit) if limit is not None else MAX_PAGE_SIZE
+    except ValueError:
+        limit = 0
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return jsonify({'error': "limit must be between 1 and {}"
+                        .format(MAX_PAGE_SIZE)}), 400
+    users = User.page(after, limit)
+    response = users_response(users)
+    if len(users) == limit:
+        response.headers['Link'] = '<{}>; rel="next"'.format(
+            url_for('app_views.view_all_users', limit=limit,
+                    after=users[-1].id))
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
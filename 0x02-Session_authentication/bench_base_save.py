@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+""" Benchmark of sequential User.save() calls with the append-only
+journal against the former full-file rewrite on every save
+
+Usage: ./bench_base_save.py [journal_saves] [rewrite_saves]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from models.base import DATA
+from models.user import User
+
+
+def journal_saves(count: int) -> float:
+    """ Time count saves appended to the journal
+    """
+    User.load_from_file()
+    start = time.perf_counter()
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i))
+        user.save()
+    return time.perf_counter() - start
+
+
+def rewrite_saves(count: int) -> float:
+    """ Time count saves each rewriting the whole .db_User.json file,
+    as Base.save() did before the journal
+    """
+    User.load_from_file()
+    start = time.perf_counter()
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i))
+        DATA['User'][user.id] = user
+        User.save_to_file()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    journal_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rewrite_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    for name, func, count in (("journal", journal_saves, journal_count),
+                              ("full rewrite", rewrite_saves, rewrite_count)):
+        os.chdir(tempfile.mkdtemp())
+        elapsed = func(count)
+        print("{:<14} {:>8} saves {:>9.2f}s {:>12,.0f} saves/s".format(
+            name, count, elapsed, count / elapsed))
+    print("full rewrite cost grows with the store size: {} saves would "
+          "take about {:.0f}s".format(
+              journal_count,
+              elapsed * (journal_count / rewrite_count) ** 2))
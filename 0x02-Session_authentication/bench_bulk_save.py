@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+""" Import benchmark: one User.save() per record against
+User.bulk_save(), with the file and SQLite storage backends
+
+Usage: ./bench_bulk_save.py [users]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import models.base
+from models.user import User
+
+
+def import_users(count: int, bulk: bool) -> float:
+    """ Time the import of count new users
+    """
+    User.load_from_file()
+    users = [User(email="user{}@hbtn.io".format(i)) for i in range(count)]
+    start = time.perf_counter()
+    if bulk:
+        User.bulk_save(users)
+    else:
+        for user in users:
+            user.save()
+    elapsed = time.perf_counter() - start
+    assert User.count() == count
+    return elapsed
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    for storage in ('file', 'sqlite'):
+        for bulk in (False, True):
+            os.chdir(tempfile.mkdtemp())
+            models.base.DATA.clear()
+            models.base._STORAGE = models.base.STORAGES[storage]()
+            elapsed = import_users(count, bulk)
+            print("{:<7} {:<10} {:>8} users {:>8.2f}s {:>10,.0f} users/s"
+                  .format(storage, "bulk_save" if bulk else "save",
+                          count, elapsed, count / elapsed))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+""" Cold-start benchmark of User.load_from_file with the eager JSON
+snapshot against the memory-mapped JSON lines snapshot, and of the
+first lookups served after each
+
+Usage: ./bench_model_coldstart.py [users]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import models.base
+from models.base import DATA
+from models.user import User
+
+
+def timed(func) -> float:
+    """ Seconds taken by func()
+    """
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    os.chdir(tempfile.mkdtemp())
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i))
+        DATA['User'][user.id] = user
+    for storage_format in ('json', 'mmap'):
+        models.base.STORAGE_FORMAT = storage_format
+        User.save_to_file()
+    ids = random.sample(list(DATA['User']), 1000)
+
+    print("{:<6} {:>10} {:>14} {:>16}".format(
+        "format", "load ms", "1000 get ms", "1000 search ms"))
+    for storage_format in ('json', 'mmap'):
+        models.base.STORAGE_FORMAT = storage_format
+        DATA.clear()
+        load = timed(User.load_from_file)
+        get = timed(lambda: [User.get(obj_id) for obj_id in ids])
+        search = timed(lambda: [
+            User.search({'email': "user{}@hbtn.io".format(i)})
+            for i in range(1000)
+        ])
+        print("{:<6} {:>10.1f} {:>14.1f} {:>16.1f}".format(
+            storage_format, load * 1000, get * 1000, search * 1000))
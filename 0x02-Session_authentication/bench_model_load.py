@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+""" Startup-time benchmark of User.load_from_file on a large
+.db_User.json: strptime parsing as before, the sliced fast path, and
+lazy timestamps left as strings until read
+
+Usage: ./bench_model_load.py [users]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import models.base
+from models.base import TIMESTAMP_FORMAT
+from models.user import User
+
+
+def strptime_timestamp(value: str) -> datetime:
+    """ Parse a timestamp the way Base.__init__ used to
+    """
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    os.chdir(tempfile.mkdtemp())
+    users = {}
+    for i in range(count):
+        user_id = str(uuid.uuid4())
+        timestamp = "20{:02d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}".format(
+            i % 30, i % 12 + 1, i % 28 + 1, i % 24, i % 60, i // 60 % 60)
+        users[user_id] = {
+            "id": user_id, "created_at": timestamp, "updated_at": timestamp,
+            "email": "user{}@hbtn.io".format(i), "_password": None,
+            "first_name": None, "last_name": None
+        }
+    with open(".db_User.json", 'w') as f:
+        json.dump(users, f)
+
+    fast_timestamp = models.base.parse_timestamp
+    modes = (("strptime", strptime_timestamp, False),
+             ("fast path", fast_timestamp, False),
+             ("lazy", fast_timestamp, True))
+    for name, parse, lazy in modes:
+        fast_timestamp.cache_clear()
+        models.base.parse_timestamp = parse
+        models.base.LAZY_TIMESTAMPS = lazy
+        start = time.perf_counter()
+        User.load_from_file()
+        elapsed = time.perf_counter() - start
+        print("{:<10} {:>8} users loaded in {:>6.2f}s".format(
+            name, User.count(), elapsed))
+    models.base.parse_timestamp = fast_timestamp
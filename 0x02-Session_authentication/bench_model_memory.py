@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+""" Memory benchmark of loading UserSession records as slotted
+instances with interned timestamps, against the former layout of one
+__dict__ and two freshly parsed datetime objects per instance
+
+Usage: ./bench_model_memory.py [records]
+"""
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from models.base import TIMESTAMP_FORMAT
+from models.user_session import UserSession
+
+
+class DictUserSession():
+    """ UserSession as it was laid out before __slots__
+    """
+
+    def __init__(self, **kwargs: dict):
+        """ Initialize like Base and UserSession used to
+        """
+        self.id = kwargs.get('id')
+        self.created_at = datetime.strptime(kwargs.get('created_at'),
+                                            TIMESTAMP_FORMAT)
+        self.updated_at = datetime.strptime(kwargs.get('updated_at'),
+                                            TIMESTAMP_FORMAT)
+        self.user_id = kwargs.get('user_id')
+        self.session_id = kwargs.get('session_id')
+
+
+def load(cls, records: list) -> int:
+    """ Return the bytes allocated to hold the records as cls instances
+    """
+    tracemalloc.start()
+    objs = {record['id']: cls(**record) for record in records}
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return size
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    user_ids = [str(uuid.uuid4()) for _ in range(1000)]
+    records = []
+    for i in range(count):
+        timestamp = "2024-07-11T12:{:02d}:{:02d}".format(i // 60 % 60,
+                                                         i % 60)
+        records.append({
+            'id': str(uuid.uuid4()),
+            'created_at': timestamp,
+            'updated_at': timestamp,
+            'user_id': user_ids[i % len(user_ids)],
+            'session_id': str(uuid.uuid4()),
+        })
+    for name, cls in (("__dict__ + datetimes", DictUserSession),
+                      ("__slots__ + interned", UserSession)):
+        size = load(cls, records)
+        print("{:<22} {:>8} records {:>12,} bytes {:>6.0f} bytes/record"
+              .format(name, count, size, size / count))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+""" Benchmark of Auth.require_auth as the excluded paths list grows:
+the former linear scan against a PathMatcher compiled once
+
+Usage: ./bench_require_auth.py [calls]
+"""
+import sys
+import timeit
+from typing import List
+
+from api.v1.auth.auth import Auth, PathMatcher
+
+
+def linear_require_auth(path: str, excluded_paths: List[str]) -> bool:
+    """ Auth.require_auth as it scanned the list on every call
+    """
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith('*'):
+            if path.startswith(excluded_path[:-1]):
+                return False
+        elif path == excluded_path:
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    auth = Auth()
+    # an authenticated request is the worst case: no entry matches
+    path = "/api/v1/users/me"
+    print("{:>9} {:>12} {:>12}".format("excluded", "linear ns", "compiled ns"))
+    for size in (4, 16, 64, 256, 1024):
+        excluded = []
+        for i in range(size):
+            if i % 2:
+                excluded.append("/api/v1/public{}/*".format(i))
+            else:
+                excluded.append("/api/v1/open{}/".format(i))
+        matcher = PathMatcher(excluded)
+        assert auth.require_auth(path, matcher) == \
+            linear_require_auth(path, excluded)
+        linear = timeit.timeit(lambda: linear_require_auth(path, excluded),
+                               number=calls)
+        compiled = timeit.timeit(lambda: auth.require_auth(path, matcher),
+                                 number=calls)
+        print("{:>9} {:>12.0f} {:>12.0f}".format(
+            size, linear / calls * 1e9, compiled / calls * 1e9))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+""" Benchmark of SessionDBAuth logins and lookups with 1M stored
+sessions, for each SESSION_DB_SYNC mode, with 1 and 16 login threads
+
+Usage: ./bench_session_db.py [stored sessions] [logins]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from api.v1.auth.session_db_auth import SessionDBAuth
+from models.base import get_storage
+from models.user_session import UserSession
+
+
+def logins(auth: SessionDBAuth, count: int, threads: int) -> float:
+    """ Logins per second of threads threads creating count sessions
+    """
+    workers = [threading.Thread(
+        target=lambda: [auth.create_session("user")
+                        for _ in range(count // threads)]
+    ) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return (count // threads) * threads / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    stored = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    os.chdir(tempfile.mkdtemp())
+    session_ids = [str(uuid.uuid4()) for _ in range(stored)]
+    auth = SessionDBAuth()
+    UserSession.bulk_save(UserSession(user_id="user{}".format(i % 1000),
+                                      session_id=session_id)
+                          for i, session_id in enumerate(session_ids))
+    lookup_ids = session_ids[::max(stored // 100000, 1)]
+    start = time.perf_counter()
+    for session_id in lookup_ids:
+        assert auth.user_id_for_session_id(session_id) is not None
+    print("{} stored sessions: {:,.0f} lookups/s".format(
+        UserSession.count(),
+        len(lookup_ids) / (time.perf_counter() - start)))
+
+    print("{:<6} {:>8} {:>12} {:>12}".format("sync", "threads", "logins/s",
+                                             "fsyncs"))
+    storage = get_storage(UserSession)
+    for sync in ('group', 'async', 'none'):
+        storage.sync = sync
+        for threads in (1, 16):
+            fsyncs = storage.fsyncs
+            rate = logins(auth, count, threads)
+            print("{:<6} {:>8} {:>12,.0f} {:>12}".format(
+                sync, threads, rate, storage.fsyncs - fsyncs))
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+""" Soak benchmark of SessionExpAuth: create sessions (each looked up
+once) at full speed with a short SESSION_DURATION, and check that the
+live sessions and the memory held stay bounded
+
+Usage: ./bench_session_soak.py [sessions] [duration]
+"""
+import os
+import resource
+import sys
+import time
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000000
+    os.environ['SESSION_DURATION'] = sys.argv[2] if len(sys.argv) > 2 \
+        else '1'
+    os.environ.setdefault('SESSION_SWEEP_INTERVAL', '0.5')
+
+    from api.v1.auth.session_exp_auth import SessionExpAuth
+
+    auth = SessionExpAuth()
+    print("{:>11} {:>10} {:>9} {:>11} {:>10}".format(
+        "sessions", "ops/s", "live", "expired", "max RSS MB"))
+    step = max(count // 10, 1)
+    start = last = time.perf_counter()
+    for i in range(1, count + 1):
+        session_id = auth.create_session("user{}".format(i % 1000))
+        auth.user_id_for_session_id(session_id)
+        if i % step == 0:
+            now = time.perf_counter()
+            stats = auth.cache_stats()
+            print("{:>11} {:>10.0f} {:>9} {:>11} {:>10.1f}".format(
+                i, 2 * step / (now - last), stats['live'],
+                stats['expired'],
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+            last = now
+    print("{} sessions in {:.1f}s".format(count,
+                                          time.perf_counter() - start))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+""" Multi-threaded stress benchmark of the SessionAuth session map:
+create / lookup / destroy cycles at 1, 4, 16 and 64 threads, with one
+dict behind a single lock against the lock-striped ShardedSessionMap
+
+Usage: ./bench_session_threads.py [cycles]
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections.abc import MutableMapping
+
+from api.v1.auth.session_store import ShardedSessionMap
+
+
+class LockedSessionMap(MutableMapping):
+    """ One dict behind one lock
+    """
+
+    def __init__(self):
+        """ Initialize an empty map
+        """
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __setitem__(self, session_id: str, user_id: str):
+        """ Create a session
+        """
+        with self._lock:
+            self._sessions[session_id] = user_id
+
+    def __getitem__(self, session_id: str) -> str:
+        """ User id of a session
+        """
+        with self._lock:
+            return self._sessions[session_id]
+
+    def __delitem__(self, session_id: str):
+        """ Destroy a session
+        """
+        with self._lock:
+            del self._sessions[session_id]
+
+    def pop_session(self, session_id: str) -> bool:
+        """ Destroy a session if it exists
+        """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        """ Number of sessions
+        """
+        return len(self._sessions)
+
+    def __iter__(self):
+        """ Session ids
+        """
+        with self._lock:
+            return iter(list(self._sessions))
+
+
+def worker(sessions: MutableMapping, cycles: int):
+    """ Run create / 4 lookups / destroy cycles
+    """
+    for i in range(cycles):
+        session_id = str(uuid.uuid4())
+        sessions[session_id] = "user{}".format(i)
+        for _ in range(4):
+            assert sessions.get(session_id) is not None
+        assert sessions.pop_session(session_id)
+
+
+def run(sessions: MutableMapping, threads: int, cycles: int) -> float:
+    """ Operations per second of threads workers sharing cycles
+    """
+    workers = [threading.Thread(target=worker,
+                                args=(sessions, cycles // threads))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    assert len(sessions) == 0
+    return (cycles // threads) * threads * 6 / elapsed
+
+
+if __name__ == "__main__":
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 256000
+    print("{} CPU cores".format(os.cpu_count()))
+    print("{:>8} {:>16} {:>16}".format("threads", "one lock ops/s",
+                                       "sharded ops/s"))
+    for threads in (1, 4, 16, 64):
+        print("{:>8} {:>16,.0f} {:>16,.0f}".format(
+            threads, run(LockedSessionMap(), threads, cycles),
+            run(ShardedSessionMap(), threads, cycles)))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+""" Multi-process benchmark of the SessionAuth backends: each worker
+process creates sessions, then looks up the sessions created by
+another worker, as gunicorn workers without sticky routing would
+
+Usage: ./bench_session_workers.py [workers] [sessions per worker]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from api.v1.auth.session_backends import (RESPServer,
+                                          session_backend_from_env)
+
+
+def create_sessions(count: int) -> list:
+    """ Create count sessions in a fresh backend of this worker and
+    return their ids with the creations per second
+    """
+    sessions = session_backend_from_env()
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    start = time.perf_counter()
+    for i, session_id in enumerate(ids):
+        sessions[session_id] = "user{}".format(i)
+    return ids, count / (time.perf_counter() - start)
+
+
+def lookup_sessions(ids: list) -> tuple:
+    """ Look the sessions of another worker up in a fresh backend and
+    return the number found with the lookups per second
+    """
+    sessions = session_backend_from_env()
+    start = time.perf_counter()
+    found = sum(sessions.get(session_id) is not None for session_id in ids)
+    return found, len(ids) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    os.chdir(tempfile.mkdtemp())
+    server = RESPServer(('127.0.0.1', 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['SESSION_REDIS_ADDR'] = "127.0.0.1:{}".format(
+        server.server_address[1])
+    os.environ['SESSION_SHM_SLOTS'] = str(2 * workers * count)
+
+    print("{:<7} {:>8} {:>14} {:>14} {:>12}".format(
+        "backend", "workers", "creates/s", "lookups/s", "found"))
+    for backend in ('memory', 'shm', 'redis'):
+        os.environ['SESSION_BACKEND'] = backend
+        with multiprocessing.Pool(workers) as pool:
+            created = pool.map(create_sessions, [count] * workers)
+            # worker i looks up the sessions created by worker i + 1
+            others = [created[(i + 1) % workers][0]
+                      for i in range(workers)]
+            looked_up = pool.map(lookup_sessions, others)
+        print("{:<7} {:>8} {:>14,.0f} {:>14,.0f} {:>11.0%}".format(
+            backend, workers, sum(rate for _, rate in created),
+            sum(rate for _, rate in looked_up),
+            sum(found for found, _ in looked_up) / (workers * count)))
+    server.shutdown()
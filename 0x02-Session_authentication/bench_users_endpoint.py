@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+""" Benchmark of GET /api/v1/users: jsonify of freshly built to_json()
+dicts as before, against the response spliced from the cached JSON
+fragments, on the first (cold) and a later (warm) request
+
+Usage: ./bench_users_endpoint.py [users]
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('AUTH_TYPE', 'none')
+os.chdir(tempfile.mkdtemp())
+
+from flask import jsonify  # noqa: E402
+
+from api.v1.app import app  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def timed(func) -> float:
+    """ Seconds taken by func()
+    """
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def jsonify_users() -> bytes:
+    """ Body of GET /api/v1/users as view_all_users used to build it
+    """
+    with app.test_request_context('/api/v1/users'):
+        return jsonify([user._build_json(False)
+                        for user in User.all()]).get_data()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    User.bulk_save(User(email="user{}@hbtn.io".format(i),
+                        first_name="First{}".format(i))
+                   for i in range(count))
+    client = app.test_client()
+    assert client.get('/api/v1/users').get_data() == jsonify_users()
+    for user in User.all():
+        user._json_cache = None
+
+    print("{:<18} {:>10}".format("GET /api/v1/users", "ms"))
+    print("{:<18} {:>10.1f}".format("jsonify", timed(jsonify_users) * 1000))
+    for name in ("cached cold", "cached warm"):
+        elapsed = timed(lambda: client.get('/api/v1/users').get_data())
+        print("{:<18} {:>10.1f}".format(name, elapsed * 1000))
@@ -1,21 +1,93 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from functools import lru_cache
+from typing import TypeVar, List, Iterable, Iterator, Tuple
+from os import getenv, path
+import gc
 import json
+import os
+import re
+import threading
 import uuid
 
+from models import mmap_store
+from models.storage import Storage, SQLiteStorage
+
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+JOURNAL_COMPACT_THRESHOLD = int(getenv('BASE_JOURNAL_COMPACT_THRESHOLD',
+                                       '10000'))
+LAZY_TIMESTAMPS = getenv('BASE_LAZY_TIMESTAMPS', '0') == '1'
+STORAGE_FORMAT = getenv('BASE_STORAGE_FORMAT', 'json')
+MMAP_CACHE_SIZE = int(getenv('BASE_MMAP_CACHE_SIZE', '10000'))
+JSON_CACHE = getenv('BASE_JSON_CACHE', '1') == '1'
+STORAGE = getenv('BASE_STORAGE', 'file')
+_JOURNALS = {}
+_INDEXES = {}
+_PENDING_INDEXES = {}
+_SORTED_IDS = {}
+_SLOTS = {}
+_TIMESTAMP_SLOTS = {'_created_at': 'created_at', '_updated_at': 'updated_at'}
+_HIDDEN_SLOTS = ('__dict__', '__weakref__', '_json_cache')
+_MISSING = object()
+_TIMESTAMP_LAYOUT = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)', re.ASCII)
+_FRAGMENT_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+_LOCK = threading.RLock()
+_STORAGE = None
+_CLASS_STORAGES = {}
+
+
+@lru_cache(maxsize=int(getenv('BASE_TIMESTAMP_CACHE', '65536')))
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string; equal strings share a single
+    interned datetime object
+
+    The fixed layout of ASCII digits is matched by a precompiled
+    pattern, which is much faster than strptime; anything else goes
+    through strptime for its errors.
+    """
+    match = _TIMESTAMP_LAYOUT.fullmatch(value)
+    if match is not None:
+        try:
+            return datetime(*map(int, match.groups()))
+        except ValueError:
+            pass
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+@lru_cache(maxsize=int(getenv('BASE_TIMESTAMP_CACHE', '65536')))
+def format_timestamp(value: datetime) -> str:
+    """ Format a datetime with TIMESTAMP_FORMAT; the interned
+    timestamps of loaded objects are formatted once
+    """
+    return value.strftime(TIMESTAMP_FORMAT)
 
 
 class Base():
     """ Base class
+
+    INDEXES lists the attributes kept in secondary hash indexes: an
+    equality search on one of them looks the matching objects up
+    instead of scanning DATA. Indexes are maintained on save, remove
+    and load, so they reflect the attribute values as last saved.
     """
 
+    INDEXES = ()
+
+    # Attributes live in slots instead of a per-instance __dict__ to
+    # keep instances small: subclasses declare theirs the same way.
+    # Timestamps are stored behind the created_at/updated_at properties
+    # so that, with LAZY_TIMESTAMPS, they stay strings until read.
+    # _json_cache holds the last public JSON representation together
+    # with the attribute values it was built from.
+    __slots__ = ('id', '_created_at', '_updated_at', '_json_cache')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
@@ -23,17 +95,77 @@ class Base():
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        # only generate a uuid when none is given: loads pass every id
+        self.id = kwargs['id'] if 'id' in kwargs else str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self._created_at = kwargs.get('created_at')
+            if not LAZY_TIMESTAMPS:
+                self._created_at = parse_timestamp(self._created_at)
         else:
-            self.created_at = datetime.utcnow()
+            self._created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self._updated_at = kwargs.get('updated_at')
+            if not LAZY_TIMESTAMPS:
+                self._updated_at = parse_timestamp(self._updated_at)
         else:
-            self.updated_at = datetime.utcnow()
+            self._updated_at = datetime.utcnow()
+
+    @property
+    def created_at(self) -> datetime:
+        """ Getter of the creation time, parsed on first access
+        """
+        if type(self._created_at) is str:
+            self._created_at = parse_timestamp(self._created_at)
+        return self._created_at
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Setter of the creation time
+        """
+        self._created_at = value
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Getter of the last update time, parsed on first access
+        """
+        if type(self._updated_at) is str:
+            self._updated_at = parse_timestamp(self._updated_at)
+        return self._updated_at
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Setter of the last update time
+        """
+        self._updated_at = value
+
+    @classmethod
+    def _slot_names(cls) -> Tuple[Tuple[str, str], ...]:
+        """ (slot, attribute name) pairs of the slot attributes of the
+        class, base class first
+        """
+        names = _SLOTS.get(cls)
+        if names is None:
+            names = tuple(
+                (name, _TIMESTAMP_SLOTS.get(name, name))
+                for klass in reversed(cls.__mro__)
+                for name in klass.__dict__.get('__slots__', ())
+                if name not in _HIDDEN_SLOTS
+            )
+            _SLOTS[cls] = names
+        return names
+
+    def _attributes(self) -> Iterable[Tuple[str, object]]:
+        """ Iterate over the (name, value) pairs of the attributes set
+        on the object, slots first; timestamps that were never read
+        are yielded as their original strings
+        """
+        for slot, name in self._slot_names():
+            try:
+                yield name, getattr(self, slot)
+            except AttributeError:
+                pass
+        # subclasses that do not declare __slots__ still get a __dict__
+        yield from getattr(self, '__dict__', {}).items()
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -47,8 +179,24 @@ class Base():
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
+        if for_serialization:
+            return self._build_json(True)
+        return dict(self._public_json()[1])
+
+    def to_json_fragment(self) -> str:
+        """ Compact JSON text of to_json(), with sorted keys like the
+        API responses, to splice into a serialized list
+        """
+        cache = self._public_json()
+        if cache[2] is None:
+            cache[2] = _FRAGMENT_ENCODER.encode(cache[1])
+        return cache[2]
+
+    def _build_json(self, for_serialization: bool) -> dict:
+        """ Build the JSON dictionary of the object
+        """
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in self._attributes():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -57,56 +205,316 @@ class Base():
                 result[key] = value
         return result
 
+    def _public_json(self) -> list:
+        """ [attribute values, to_json() dict, JSON text or None] of the
+        object, cached until one of its attributes changes
+        """
+        if not JSON_CACHE or hasattr(self, '__dict__'):
+            return [None, self._build_json(False), None]
+        names = self._slot_names()
+        state = tuple([getattr(self, slot, _MISSING) for slot, _ in names])
+        cache = getattr(self, '_json_cache', None)
+        if cache is None or cache[0] != state:
+            result = {}
+            for (_, key), value in zip(names, state):
+                if key[0] == '_' or value is _MISSING:
+                    continue
+                if type(value) is datetime:
+                    value = format_timestamp(value)
+                result[key] = value
+            cache = [state, result, None]
+            self._json_cache = cache
+        return cache
+
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from the storage backend
+        """
+        get_storage(cls).load(cls)
+
+    @classmethod
+    def _load_from_file(cls, file_path: str):
+        """ Load the snapshot and replay the journals into DATA
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        legacy_path = ".db_{}.json".format(s_class)
+        with _LOCK:
+            DATA[s_class] = {}
+            _SORTED_IDS.pop(s_class, None)
+            indexed_values = None
+            if STORAGE_FORMAT == 'mmap' and path.exists(file_path):
+                index = mmap_store.read_index(file_path)
+                DATA[s_class] = mmap_store.LazyObjects(
+                    cls, file_path, index['ids'], index['starts'],
+                    MMAP_CACHE_SIZE
+                )
+                if index['attrs'] == tuple(cls.INDEXES):
+                    indexed_values = (index['ids'], index['values'])
+            elif path.exists(legacy_path):
+                with open(legacy_path, 'r') as f:
+                    objs_json = json.load(f)
+                    for obj_id, obj_json in objs_json.items():
+                        DATA[s_class][obj_id] = cls(**obj_json)
+            if indexed_values is not None:
+                # built on the first indexed search
+                _PENDING_INDEXES[s_class] = indexed_values
+            replayed = 0
+            for journal_path in (cls._journal_path() + ".compacting",
+                                 cls._journal_path()):
+                replayed += cls._replay_journal(journal_path)
+            journal = cls._journal()
+            if journal['file'] is not None:
+                journal['file'].close()
+                journal['file'] = None
+            journal['records'] = replayed
+            if indexed_values is None:
+                cls._rebuild_indexes()
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def _replay_journal(cls, journal_path: str) -> int:
+        """ Apply the records of a journal file to DATA
+        """
+        s_class = cls.__name__
+        if not path.exists(journal_path):
+            return 0
+        count = 0
+        with open(journal_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn write at the end of the journal
+                    break
+                if record['op'] == 'save':
+                    obj = cls(**record['obj'])
+                    DATA[s_class][record['id']] = obj
+                    obj._index()
+                else:
+                    obj = DATA[s_class].pop(record['id'], None)
+                    if obj is not None:
+                        obj._unindex()
+                count += 1
+        return count
 
     @classmethod
-    def save_to_file(cls):
+    def _snapshot_path(cls) -> str:
+        """ Path of the snapshot file of the class: a JSON document, or
+        JSON lines with an offset index when BASE_STORAGE_FORMAT=mmap
+        """
+        if STORAGE_FORMAT == 'mmap':
+            return ".db_{}.jsonl".format(cls.__name__)
+        return ".db_{}.json".format(cls.__name__)
+
+    @classmethod
+    def save_to_file(cls, file_path: str = None):
         """ Save all objects to file
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        if file_path is None:
+            file_path = cls._snapshot_path()
+        if STORAGE_FORMAT == 'mmap':
+            with _LOCK:
+                lines = list(cls._snapshot_lines())
+            mmap_store.write_snapshot(file_path, lines, cls.INDEXES)
+            return
+        with _LOCK:
+            objs_json = {}
+            for obj_id, obj in DATA[s_class].items():
+                objs_json[obj_id] = obj.to_json(True)
 
-        with open(file_path, 'w') as f:
+        tmp_path = "{}.{}.tmp".format(file_path, threading.get_ident())
+        with open(tmp_path, 'w') as f:
             json.dump(objs_json, f)
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def _snapshot_lines(cls) -> Iterable[Tuple[str, bytes, tuple]]:
+        """ (id, JSON line, indexed values) of every object; objects
+        unchanged since the mapped snapshot are copied without parsing
+        """
+        objs = DATA[cls.__name__]
+        raw = getattr(objs, 'raw', None)
+        values = cls._indexes()[None] if cls.INDEXES else {}
+        for obj_id in objs:
+            line = raw(obj_id) if raw is not None else None
+            if line is None:
+                obj = objs[obj_id]
+                line = json.dumps(obj.to_json(True)).encode()
+                indexed = tuple(getattr(obj, attr, None)
+                                for attr in cls.INDEXES)
+            else:
+                indexed = values.get(obj_id, ())
+            yield obj_id, line, indexed
+
+    @classmethod
+    def _journal_path(cls) -> str:
+        """ Path of the append-only journal of the class
+        """
+        return ".db_{}.journal".format(cls.__name__)
+
+    @classmethod
+    def _journal(cls) -> dict:
+        """ Journal state of the class: open file, record count and
+        whether a compaction is running
+        """
+        s_class = cls.__name__
+        if s_class not in _JOURNALS:
+            _JOURNALS[s_class] = {
+                'file': None, 'records': 0, 'compacting': False
+            }
+        return _JOURNALS[s_class]
+
+    @classmethod
+    def _append_journal(cls, records: List[dict]):
+        """ Append records to the journal in a single write, then start
+        a compaction in the background when the journal grew past the
+        threshold
+        """
+        with _LOCK:
+            journal = cls._journal()
+            if journal['file'] is None:
+                journal['file'] = open(cls._journal_path(), 'a')
+            journal['file'].write("".join(
+                json.dumps(record) + "\n" for record in records))
+            journal['file'].flush()
+            journal['records'] += len(records)
+            if journal['records'] < JOURNAL_COMPACT_THRESHOLD or \
+                    journal['compacting']:
+                return
+            journal['compacting'] = True
+        threading.Thread(target=cls.compact, daemon=True).start()
+
+    @classmethod
+    def compact(cls):
+        """ Rewrite the snapshot from DATA and drop the journal records
+        it now contains
+        """
+        journal_path = path.abspath(cls._journal_path())
+        file_path = path.abspath(cls._snapshot_path())
+        with _LOCK:
+            journal = cls._journal()
+            journal['compacting'] = True
+            if journal['file'] is not None:
+                journal['file'].close()
+                journal['file'] = None
+            compacting_path = journal_path + ".compacting"
+            if path.exists(journal_path) and path.exists(compacting_path):
+                # a previous compaction did not finish: keep its records
+                with open(compacting_path, 'a') as dst, \
+                        open(journal_path, 'r') as src:
+                    dst.write(src.read())
+                os.remove(journal_path)
+            elif path.exists(journal_path):
+                os.replace(journal_path, compacting_path)
+            journal['records'] = 0
+        try:
+            cls.save_to_file(file_path)
+            if path.exists(compacting_path):
+                os.remove(compacting_path)
+        finally:
+            with _LOCK:
+                journal['compacting'] = False
+
+    @classmethod
+    def _indexes(cls) -> dict:
+        """ Secondary indexes of the class: for each indexed attribute,
+        a dict of value -> ids (as dict keys, to keep insertion order),
+        plus the indexed values of each object under the None key
+        """
+        s_class = cls.__name__
+        if s_class in _PENDING_INDEXES:
+            with _LOCK:
+                if s_class in _PENDING_INDEXES:
+                    cls._restore_indexes(*_PENDING_INDEXES.pop(s_class))
+        if s_class not in _INDEXES:
+            _INDEXES[s_class] = {attr: {} for attr in cls.INDEXES}
+            _INDEXES[s_class][None] = {}
+        return _INDEXES[s_class]
+
+    @classmethod
+    def _rebuild_indexes(cls):
+        """ Rebuild the secondary indexes from DATA
+        """
+        with _LOCK:
+            _INDEXES.pop(cls.__name__, None)
+            _PENDING_INDEXES.pop(cls.__name__, None)
+            for obj in DATA[cls.__name__].values():
+                obj._index()
+
+    @classmethod
+    def _restore_indexes(cls, ids: List[str], columns: List[list]):
+        """ Rebuild the secondary indexes from the indexed values saved
+        with a snapshot (one column of values per attribute, aligned
+        with ids), without loading the objects
+        """
+        with _LOCK:
+            indexes = {attr: {} for attr in cls.INDEXES}
+            indexes[None] = dict(zip(ids, zip(*columns)))
+            for attr, column in zip(cls.INDEXES, columns):
+                index = indexes[attr]
+                for obj_id, value in zip(ids, column):
+                    try:
+                        index.setdefault(value, {})[obj_id] = None
+                    except TypeError:
+                        pass
+            _INDEXES[cls.__name__] = indexes
+
+    def _index(self):
+        """ Add the object to the secondary indexes of its class, or
+        move it when an indexed attribute changed since it was indexed
+        """
+        if not self.INDEXES:
+            return
+        indexes = self._indexes()
+        values = tuple(getattr(self, attr, None) for attr in self.INDEXES)
+        previous = indexes[None].get(self.id)
+        if previous == values:
+            return
+        if previous is not None:
+            self._unindex()
+        for attr, value in zip(self.INDEXES, values):
+            try:
+                indexes[attr].setdefault(value, {})[self.id] = None
+            except TypeError:
+                # unhashable value: only reachable by scanning
+                pass
+        indexes[None][self.id] = values
+
+    def _unindex(self):
+        """ Remove the object from the secondary indexes of its class
+        """
+        if not self.INDEXES:
+            return
+        indexes = self._indexes()
+        values = indexes[None].pop(self.id, None)
+        if values is None:
+            return
+        for attr, value in zip(self.INDEXES, values):
+            try:
+                bucket = indexes[attr].get(value)
+            except TypeError:
+                continue
+            if bucket is not None:
+                bucket.pop(self.id, None)
+                if not bucket:
+                    del indexes[attr][value]
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        get_storage(self.__class__).save(self)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        get_storage(self.__class__).remove(self)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return get_storage(cls).count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,13 +526,155 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return get_storage(cls).get(cls, id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
+        return get_storage(cls).search(cls, attributes)
+
+    @classmethod
+    def use_storage(cls, storage: Storage = None):
+        """ Store the objects of this class in storage instead of the
+        backend selected by BASE_STORAGE (restored when None)
+        """
+        with _LOCK:
+            if storage is None:
+                _CLASS_STORAGES.pop(cls, None)
+            else:
+                _CLASS_STORAGES[cls] = storage
+
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = 100) -> List[TypeVar('Base')]:
+        """ Return at most limit objects ordered by id, starting after
+        the id `after`: pass the id of the last object of a page to get
+        the next one
+        """
+        return get_storage(cls).page(cls, after, limit)
+
+    @classmethod
+    def bulk_save(cls, objs: Iterable[TypeVar('Base')]):
+        """ Save several objects with a single flush
+        """
+        objs = list(objs)
+        now = datetime.utcnow()
+        for obj in objs:
+            obj.updated_at = now
+        get_storage(cls).bulk_save(objs)
+
+    @classmethod
+    def bulk_remove(cls, objs: Iterable[TypeVar('Base')]):
+        """ Remove several objects with a single flush
+        """
+        get_storage(cls).bulk_remove(list(objs))
+
+    @classmethod
+    def batch(cls) -> Iterator[None]:
+        """ Context manager deferring the persistence of the save() and
+        remove() calls made by the current thread in the block to a
+        single flush at exit; the objects are visible to get/search
+        inside the block. If the block raises, the sqlite backend rolls
+        its writes back while the file backend keeps them
+        """
+        return get_storage(cls).batch()
+
+
+class FileStorage(Storage):
+    """ Storage of the objects in DATA, persisted to a snapshot file
+    per class plus the append-only journal of the changes since
+    """
+
+    def __init__(self):
+        """ Initialize the per-thread batch state
+        """
+        self._local = threading.local()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """ Apply the writes of the block to DATA immediately but
+        buffer their journal records, written once per class at exit
+        """
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            yield
+            return
+        self._local.pending = pending = {}
+        try:
+            yield
+        finally:
+            # the changes are in DATA already: journal them even when
+            # the block failed halfway
+            self._local.pending = None
+            for klass, records in pending.items():
+                klass._append_journal(records)
+
+    def _journal(self, obj: Base, record: dict):
+        """ Journal a record now, or at the end of the current batch
+        """
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            obj.__class__._append_journal([record])
+        else:
+            pending.setdefault(obj.__class__, []).append(record)
+
+    def load(self, cls: type):
+        """ Load all objects from file: the snapshot, then the journal
+        records appended since it was written
+        """
+        file_path = cls._snapshot_path()
+        # the objects loaded hold no reference cycles: skip the cyclic
+        # collector passes that allocating them would trigger
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            cls._load_from_file(file_path)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def save(self, obj: Base):
+        """ Store the object and journal it
+        """
+        s_class = obj.__class__.__name__
+        with _LOCK:
+            ids = _SORTED_IDS.get(s_class)
+            if ids is not None and obj.id not in DATA[s_class]:
+                insort(ids, obj.id)
+            DATA[s_class][obj.id] = obj
+            obj._index()
+            self._journal(obj, {
+                'op': 'save', 'id': obj.id, 'obj': obj.to_json(True)
+            })
+
+    def remove(self, obj: Base):
+        """ Drop the object and journal its removal
+        """
+        s_class = obj.__class__.__name__
+        with _LOCK:
+            if DATA[s_class].get(obj.id) is not None:
+                del DATA[s_class][obj.id]
+                ids = _SORTED_IDS.get(s_class)
+                if ids is not None:
+                    del ids[bisect_left(ids, obj.id)]
+                obj._unindex()
+                self._journal(obj, {'op': 'remove', 'id': obj.id})
+
+    def count(self, cls: type) -> int:
+        """ Count all objects
+        """
+        return len(DATA[cls.__name__].keys())
+
+    def get(self, cls: type, id: str) -> Base:
+        """ Return one object by ID
+        """
+        return DATA[cls.__name__].get(id)
+
+    def search(self, cls: type, attributes: dict) -> List[Base]:
+        """ Search all objects with matching attributes, looking the
+        candidates up in a secondary index when one applies
+        """
         s_class = cls.__name__
         def _search(obj):
             if len(attributes) == 0:
@@ -133,5 +683,56 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        objs = DATA[s_class]
+        candidates = objs.values()
+        for attr in cls.INDEXES:
+            if attr not in attributes:
+                continue
+            try:
+                bucket = cls._indexes()[attr].get(attributes[attr], {})
+            except TypeError:
+                continue
+            candidates = [objs[obj_id] for obj_id in list(bucket)
+                          if obj_id in objs]
+            break
+        return list(filter(_search, candidates))
+
+    def page(self, cls: type, after: str, limit: int) -> List[Base]:
+        """ At most limit objects ordered by id after the cursor, from
+        a sorted list of the ids built on first use and kept up to date
+        by save and remove
+        """
+        s_class = cls.__name__
+        with _LOCK:
+            ids = _SORTED_IDS.get(s_class)
+            if ids is None:
+                ids = _SORTED_IDS[s_class] = sorted(DATA[s_class])
+            start = 0 if after is None else bisect_right(ids, after)
+            objs = DATA[s_class]
+            return [objs[obj_id] for obj_id in ids[start:start + limit]
+                    if obj_id in objs]
+
+
+STORAGES = {
+    'file': FileStorage,
+    'sqlite': SQLiteStorage,
+}
+
+
+def get_storage(cls: type = None) -> Storage:
+    """ Storage backend of cls: the one given to cls.use_storage, else
+    the one selected by BASE_STORAGE, created on first use
+    """
+    global _STORAGE
+    storage = _CLASS_STORAGES.get(cls)
+    if storage is not None:
+        return storage
+    if _STORAGE is None:
+        with _LOCK:
+            if _STORAGE is None:
+                if STORAGE not in STORAGES:
+                    raise ValueError(
+                        "Unknown storage backend: {}".format(STORAGE))
+                _STORAGE = STORAGES[STORAGE]()
+    return _STORAGE
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+""" Memory-mapped snapshot storage module
+
+A snapshot is a pair of files:
+  - `<name>.jsonl`: one JSON object per line, then a trailer line
+    holding the random generation of the snapshot
+  - `<name>.jsonl.idx`: a marshal dump of the ids in file order, the
+    array of line start offsets, the indexed attribute values and the
+    generation
+Opening a snapshot only loads the `.idx` file; objects are parsed
+from the memory-mapped `.jsonl` file the first time they are read.
+"""
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from os import path
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
+import json
+import marshal
+import mmap
+import os
+import threading
+import uuid
+
+
+class LazyObjects(MutableMapping):
+    """ Mapping of id -> object backed by a memory-mapped snapshot
+
+    Objects read from the snapshot are kept in a bounded LRU cache.
+    Objects stored in the mapping after it was opened are newer than
+    the snapshot and are kept until the next load.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., Any],
+        file_path: str,
+        ids: List[str],
+        starts: array,
+        cache_size: int = 10000
+    ):
+        """ Map the snapshot file; the line of ids[i] spans from
+        starts[i] to the newline before starts[i + 1]
+        """
+        self._factory = factory
+        self._positions = dict(zip(ids, range(len(ids))))
+        self._starts = starts
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._dirty = {}
+        self._removed = set()
+        self._added = 0
+        self._lock = threading.Lock()
+        self._mm = None
+        if ids:
+            with open(file_path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def raw(self, key: str) -> bytes:
+        """ JSON line of an object not modified since the snapshot was
+        written, or None
+        """
+        if key in self._dirty or key in self._removed:
+            return None
+        position = self._positions.get(key)
+        if position is None:
+            return None
+        return self._mm[self._starts[position]:
+                        self._starts[position + 1] - 1]
+
+    def __getitem__(self, key: str) -> Any:
+        """ Object of the id, parsed from the snapshot if needed
+        """
+        obj = self._dirty.get(key)
+        if obj is not None:
+            return obj
+        with self._lock:
+            obj = self._cache.get(key)
+            if obj is not None:
+                self._cache.move_to_end(key)
+                return obj
+        data = self.raw(key)
+        if data is None:
+            raise KeyError(key)
+        obj_json = json.loads(data)
+        if obj_json.get('id') != key:
+            raise ValueError("Snapshot line of {} holds {}".format(
+                key, obj_json.get('id')))
+        obj = self._factory(**obj_json)
+        with self._lock:
+            self._cache[key] = obj
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return obj
+
+    def __setitem__(self, key: str, obj: Any):
+        """ Store an object, taking precedence over the snapshot
+        """
+        with self._lock:
+            if key not in self:
+                self._added += key not in self._positions
+            self._dirty[key] = obj
+            self._removed.discard(key)
+            self._cache.pop(key, None)
+
+    def __delitem__(self, key: str):
+        """ Remove an object
+        """
+        with self._lock:
+            if key not in self:
+                raise KeyError(key)
+            self._dirty.pop(key, None)
+            self._cache.pop(key, None)
+            if key in self._positions:
+                self._removed.add(key)
+            else:
+                self._added -= 1
+
+    def __contains__(self, key: object) -> bool:
+        """ Whether the id is stored, without parsing its object
+        """
+        if key in self._dirty:
+            return True
+        return key in self._positions and key not in self._removed
+
+    def __len__(self) -> int:
+        """ Number of stored objects
+        """
+        return len(self._positions) - len(self._removed) + self._added
+
+    def __iter__(self) -> Iterator[str]:
+        """ Ids in snapshot order, then ids added since
+        """
+        removed = self._removed
+        for key in list(self._positions):
+            if key not in removed:
+                yield key
+        for key in list(self._dirty):
+            if key not in self._positions:
+                yield key
+
+
+def index_path(file_path: str) -> str:
+    """ Path of the offset index of a snapshot
+    """
+    return file_path + ".idx"
+
+
+def write_snapshot(
+    file_path: str,
+    lines: Iterable[Tuple[str, bytes, tuple]],
+    attrs: Tuple[str, ...] = ()
+):
+    """ Atomically write a snapshot from (id, JSON line, indexed values)
+    triples; attrs names the indexed attributes
+    """
+    ids = []
+    starts = array('q', [0])
+    values = [[] for _ in attrs]
+    generation = uuid.uuid4().hex
+    tmp_suffix = ".{}.tmp".format(threading.get_ident())
+    with open(file_path + tmp_suffix, 'wb') as f:
+        for obj_id, line, indexed in lines:
+            if "\n" in obj_id:
+                raise ValueError("Invalid id: {!r}".format(obj_id))
+            f.write(line)
+            f.write(b"\n")
+            ids.append(obj_id)
+            starts.append(starts[-1] + len(line) + 1)
+            for column, value in zip(values, indexed):
+                column.append(value)
+        f.write(_trailer(generation))
+    with open(index_path(file_path) + tmp_suffix, 'wb') as f:
+        marshal.dump({'attrs': tuple(attrs), 'ids': "\n".join(ids),
+                      'starts': starts.tobytes(), 'values': values,
+                      'generation': generation}, f)
+    # the index is replaced last: an index left over from the previous
+    # snapshot has another generation than the trailer, and is rebuilt
+    os.replace(file_path + tmp_suffix, file_path)
+    os.replace(index_path(file_path) + tmp_suffix, index_path(file_path))
+
+
+def _trailer(generation: str) -> bytes:
+    """ Last line of a snapshot of the generation
+    """
+    return json.dumps({'generation': generation}).encode() + b"\n"
+
+
+def read_index(file_path: str) -> dict:
+    """ Ids, line start offsets and indexed values of a snapshot,
+    rebuilt by scanning the snapshot when the index file is missing
+    or of another generation (values is then None)
+    """
+    size = path.getsize(file_path)
+    try:
+        with open(index_path(file_path), 'rb') as f:
+            index = marshal.loads(f.read())
+        starts = array('q')
+        starts.frombytes(index['starts'])
+        trailer = _trailer(index['generation'])
+        with open(file_path, 'rb') as f:
+            f.seek(starts[-1])
+            current = f.read(len(trailer) + 1) == trailer
+        if current and starts[-1] + len(trailer) == size:
+            index['ids'] = index['ids'].split("\n") if index['ids'] else []
+            index['starts'] = starts
+            return index
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        pass
+    ids = []
+    starts = array('q', [0])
+    with open(file_path, 'rb') as f:
+        for line in f:
+            record = json.loads(line)
+            if 'id' not in record:
+                # the generation trailer
+                break
+            ids.append(record['id'])
+            starts.append(starts[-1] + len(line))
+    return {'attrs': None, 'ids': ids, 'starts': starts, 'values': None}
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+""" Expired session garbage collection module
+
+UserSession records outlive their SESSION_DURATION: collect() removes
+the expired ones with a single bulk_remove, and SessionCollector runs
+it periodically and after a number of new sessions. Offline, the log
+(or the file store) is collected and compacted with:
+
+    python3 -m models.session_gc [--duration N] [--storage log|file]
+"""
+from datetime import datetime, timedelta
+from os import getenv, path
+from typing import List, Optional
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+
+from models.user_session import UserSession
+
+
+def expired_sessions(duration: int,
+                     now: Optional[datetime] = None) -> List[UserSession]:
+    """ UserSession records created more than duration seconds ago;
+    none when duration <= 0 (sessions never expire)
+    """
+    if duration <= 0:
+        return []
+    deadline = (now or datetime.utcnow()) - timedelta(seconds=duration)
+    return [user_session for user_session in UserSession.all()
+            if user_session.created_at < deadline]
+
+
+def collect(duration: int) -> dict:
+    """ Remove the expired UserSession records in one persistence flush
+    and return how many records and serialized bytes were reclaimed
+    """
+    start = time.perf_counter()
+    scanned = UserSession.count()
+    expired = expired_sessions(duration)
+    reclaimed_bytes = sum(len(json.dumps(user_session.to_json(True)))
+                          for user_session in expired)
+    UserSession.bulk_remove(expired)
+    return {
+        'scanned': scanned,
+        'reclaimed': len(expired),
+        'reclaimed_bytes': reclaimed_bytes,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+class SessionCollector():
+    """ Runs collect() every interval seconds (when positive) in a
+    daemon thread, and in the background once threshold sessions
+    were created since the last run (when positive)
+    """
+
+    def __init__(self, duration: int, interval: float = 300,
+                 threshold: int = 10000):
+        """ Start the periodic collection
+        """
+        self.duration = duration
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._running = False
+        self._created = 0
+        self.runs = 0
+        self.reclaimed = 0
+        self.reclaimed_bytes = 0
+        self.last_run = None
+        self._stop = threading.Event()
+        if duration > 0 and interval > 0:
+            threading.Thread(target=self._loop, args=(interval,),
+                             daemon=True).start()
+
+    def _loop(self, interval: float):
+        """ Collect every interval seconds until stopped
+        """
+        while not self._stop.wait(interval):
+            self._collect_logged(self.collect)
+
+    @staticmethod
+    def _collect_logged(collect_once):
+        """ Run a background collection, logging its failure instead of
+        ending the thread
+        """
+        try:
+            collect_once()
+        except Exception:
+            logging.getLogger(__name__).exception(
+                "Expired session collection failed")
+
+    def stop(self):
+        """ Stop the periodic collection
+        """
+        self._stop.set()
+
+    def session_created(self):
+        """ Count a new session, starting a collection in the
+        background when the threshold is reached
+        """
+        if self.duration <= 0 or self.threshold <= 0:
+            return
+        with self._lock:
+            self._created += 1
+            if self._created < self.threshold or self._running:
+                return
+            # claimed here so that the next logins start no other thread
+            self._running = True
+            self._created = 0
+        threading.Thread(target=self._collect_logged, args=(self._run,),
+                         daemon=True).start()
+
+    def collect(self) -> Optional[dict]:
+        """ Run one collection, unless one is already running
+        """
+        with self._lock:
+            if self._running:
+                return None
+            self._running = True
+            self._created = 0
+        return self._run()
+
+    def _run(self) -> dict:
+        """ Run one collection claimed by setting _running
+        """
+        try:
+            result = collect(self.duration)
+        finally:
+            with self._lock:
+                self._running = False
+        with self._lock:
+            self.runs += 1
+            self.reclaimed += result['reclaimed']
+            self.reclaimed_bytes += result['reclaimed_bytes']
+            self.last_run = result
+        return result
+
+    def stats(self) -> dict:
+        """ Collections run, records and bytes reclaimed so far, and
+        the result of the last run
+        """
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'reclaimed': self.reclaimed,
+                'reclaimed_bytes': self.reclaimed_bytes,
+                'last_run': self.last_run,
+            }
+
+
+def main(argv: List[str] = None) -> int:
+    """ Collect the expired sessions of a stopped application and
+    compact its session store
+    """
+    parser = argparse.ArgumentParser(
+        prog="python3 -m models.session_gc",
+        description="Remove expired UserSession records and compact "
+                    "the session store.")
+    parser.add_argument('--duration', type=int,
+                        default=int(getenv('SESSION_DURATION', '0')),
+                        help="session lifetime in seconds "
+                             "(default: SESSION_DURATION)")
+    parser.add_argument('--storage', choices=('log', 'file'),
+                        default='log',
+                        help="log: the SessionDBAuth log (default); "
+                             "file: the Base store of UserSession")
+    parser.add_argument('--path',
+                        default=getenv('SESSION_DB_PATH',
+                                       '.db_UserSession.log'),
+                        help="session log (default: SESSION_DB_PATH)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only count the expired sessions")
+    args = parser.parse_args(argv)
+    if args.duration <= 0:
+        print("Sessions never expire (duration {})".format(args.duration),
+              file=sys.stderr)
+        return 1
+
+    if args.storage == 'log':
+        from models.session_log import SessionLogStorage
+        storage = SessionLogStorage(args.path)
+        UserSession.use_storage(storage)
+        files = [args.path]
+    else:
+        storage = None
+        files = [UserSession._snapshot_path(), UserSession._journal_path()]
+    UserSession.load_from_file()
+    size_before = sum(path.getsize(f) for f in files if path.exists(f))
+
+    if args.dry_run:
+        expired = expired_sessions(args.duration)
+        print("{} of {} sessions expired".format(len(expired),
+                                                 UserSession.count()))
+        return 0
+    result = collect(args.duration)
+    # an empty store, or one without expired sessions, is left as is
+    if result['reclaimed'] > 0:
+        if storage is not None:
+            storage.compact()
+        else:
+            UserSession.compact()
+    size_after = sum(path.getsize(f) for f in files if path.exists(f))
+    print("{} of {} sessions expired and removed in {:.2f}s; "
+          "{:,} bytes reclaimed on disk".format(
+              result['reclaimed'], result['scanned'], result['seconds'],
+              max(0, size_before - size_after)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+""" Session log storage module
+
+SessionLogStorage keeps the objects of one class in memory, keyed by
+id and by a unique key attribute (session_id for UserSession), and
+persists them to an append-only log of JSON lines. Writers do not
+write the log themselves: their records are queued for a flusher
+thread which writes and fsyncs everything queued at once (group
+commit), so concurrent logins share one fsync.
+
+When a batch cannot be written, every writer waiting for one of its
+records gets the error and the storage fails: later writes raise it too
+(the objects stay in memory) until compact() rewrites the log from
+memory, or load() reads it back.
+"""
+from os import path
+from typing import Any, Iterable, List, Optional
+import json
+import os
+import threading
+
+from models.storage import Storage, _matches
+
+
+class SessionLogStorage(Storage):
+    """ Storage of the objects of one class in an append-only log
+
+    sync sets the durability of a write when it returns:
+      - `group`: written and fsynced (shared with concurrent writes)
+      - `async`: queued; fsynced by the flusher shortly after
+      - `none`: queued; written but never fsynced
+    The log is rewritten with the live objects only once it holds
+    more than compact_ratio records per live object.
+    """
+
+    def __init__(self, file_path: str, key: str = 'session_id',
+                 sync: str = 'group', compact_ratio: float = 4.0):
+        """ Use the log at file_path; objects are looked up by key
+        """
+        if sync not in ('group', 'async', 'none'):
+            raise ValueError("Unknown sync mode: {}".format(sync))
+        self.file_path = path.abspath(file_path)
+        self.key = key
+        self.sync = sync
+        self.compact_ratio = compact_ratio
+        self._objs = {}
+        self._ids_by_key = {}
+        self._records = 0
+        self._cond = threading.Condition()
+        self._queue = []
+        self._queued = 0
+        self._synced = 0
+        self._durable = 0
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._flusher = None
+        self._error = None
+        self.fsyncs = 0
+
+    def load(self, cls: type):
+        """ Replay the log into memory
+        """
+        with self._cond:
+            self._wait_flushed(self._queued)
+            self._error = None
+            self._durable = self._synced
+            self._objs = {}
+            self._ids_by_key = {}
+            self._records = 0
+            if not path.exists(self.file_path):
+                return
+            with open(self.file_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # torn write at the end of the log
+                        break
+                    if record['op'] == 'save':
+                        self._store(cls(**record['obj']))
+                    else:
+                        self._drop(record['id'])
+                    self._records += 1
+
+    def _store(self, obj: Any):
+        """ Index an object in memory; the lock must be held
+        """
+        previous = self._objs.get(obj.id)
+        if previous is not None:
+            self._ids_by_key.pop(getattr(previous, self.key, None), None)
+        self._objs[obj.id] = obj
+        key = getattr(obj, self.key, None)
+        if key is not None:
+            self._ids_by_key[key] = obj.id
+
+    def _drop(self, obj_id: str) -> bool:
+        """ Forget an object; the lock must be held
+        """
+        obj = self._objs.pop(obj_id, None)
+        if obj is None:
+            return False
+        self._ids_by_key.pop(getattr(obj, self.key, None), None)
+        return True
+
+    def _append(self, lines: List[str]):
+        """ Queue log lines and, with sync=group, wait until they are
+        on disk; the lock must be held (waiting releases it)
+        """
+        if not lines:
+            return
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            self._queue.extend(lines)
+            self._queued += len(lines)
+            self._records += len(lines)
+            target = self._queued
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop,
+                                                 daemon=True)
+                self._flusher.start()
+            self._cond.notify_all()
+            if self.sync == 'group':
+                self._wait_synced(target)
+
+    def _wait_flushed(self, target: int):
+        """ Wait until the flusher handled the first target records,
+        written or not; the lock must be held
+        """
+        while self._synced < target:
+            self._cond.wait()
+
+    def _wait_synced(self, target: int):
+        """ Wait until the flusher wrote the first target records, and
+        raise the error of the storage when one of them was not; the
+        lock must be held
+        """
+        self._wait_flushed(target)
+        if self._durable < target:
+            raise self._error
+
+    def _flush_loop(self):
+        """ Write and fsync the queued lines, one batch at a time
+        """
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                lines, self._queue = self._queue, []
+                target = self._queued
+                failed = self._error is not None
+            error = None
+            if not failed:
+                # the lines queued after a failed batch are not written:
+                # the log would miss the records of the failed one
+                try:
+                    self._write(lines)
+                except Exception as e:
+                    # reported to the writers waiting for these lines
+                    error = e
+            with self._cond:
+                if error is not None:
+                    self._error = error
+                elif not failed:
+                    self._durable = target
+                self._synced = target
+                self._cond.notify_all()
+                compact = self._error is None and self._records > 10000 \
+                    and self._records > self.compact_ratio * len(self._objs)
+            if compact:
+                try:
+                    self._compact()
+                except Exception:
+                    # the log is still complete: retried after next batch
+                    pass
+
+    def _write(self, lines: List[str]):
+        """ Append lines to the log and fsync it unless sync=none
+        """
+        with self._file_lock:
+            if self._file is None:
+                self._file = open(self.file_path, 'a')
+            self._file.write("".join(lines))
+            self._file.flush()
+            if self.sync != 'none':
+                os.fsync(self._file.fileno())
+                self.fsyncs += 1
+
+    def compact(self):
+        """ Write the queued records, then rewrite the log with the live
+        objects only; this also recovers the storage from a failed write
+        """
+        with self._cond:
+            self._wait_flushed(self._queued)
+        self._compact()
+
+    def _compact(self):
+        """ Rewrite the log with the live objects only
+        """
+        with self._file_lock:
+            with self._cond:
+                objs = list(self._objs.values())
+                queued = self._queued
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                for obj in objs:
+                    f.write(self._save_line(obj))
+                f.flush()
+                if self.sync != 'none':
+                    os.fsync(f.fileno())
+            # records queued since the copy are written after it:
+            # replaying them again is harmless
+            os.replace(tmp_path, self.file_path)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            with self._cond:
+                self._records = len(objs) + queued - self._synced
+                if self._error is not None and self._synced >= queued:
+                    # every object stored before the failure is written
+                    self._error = None
+                    self._durable = self._synced
+
+    @staticmethod
+    def _save_line(obj: Any) -> str:
+        """ Log line of a save
+        """
+        return json.dumps({'op': 'save', 'obj': obj.to_json(True)}) + "\n"
+
+    def save(self, obj: Any):
+        """ Store an object and log it
+        """
+        self.bulk_save((obj,))
+
+    def bulk_save(self, objs: Iterable[Any]):
+        """ Store objects and log them with a single commit
+        """
+        lines = []
+        with self._cond:
+            # queued in the order of the memory updates: the log
+            # replays the last version of each object
+            for obj in objs:
+                self._store(obj)
+                lines.append(self._save_line(obj))
+            self._append(lines)
+
+    def remove(self, obj: Any):
+        """ Drop an object and log it
+        """
+        self.bulk_remove((obj,))
+
+    def bulk_remove(self, objs: Iterable[Any]):
+        """ Drop objects and log them with a single commit
+        """
+        lines = []
+        with self._cond:
+            for obj in objs:
+                if self._drop(obj.id):
+                    lines.append(json.dumps({'op': 'remove',
+                                             'id': obj.id}) + "\n")
+            self._append(lines)
+
+    def count(self, cls: type) -> int:
+        """ Number of stored objects
+        """
+        return len(self._objs)
+
+    def get(self, cls: type, id: str) -> Optional[Any]:
+        """ Stored object with this id, or None
+        """
+        return self._objs.get(id)
+
+    def search(self, cls: type, attributes: dict) -> List[Any]:
+        """ Stored objects whose attributes equal the given ones, looked
+        up by id or key when given
+        """
+        if 'id' in attributes:
+            obj = self._objs.get(attributes['id'])
+            candidates = [] if obj is None else [obj]
+        elif self.key in attributes:
+            try:
+                obj_id = self._ids_by_key.get(attributes[self.key])
+            except TypeError:
+                obj_id = None
+            obj = self._objs.get(obj_id) if obj_id is not None else None
+            candidates = [] if obj is None else [obj]
+        else:
+            with self._cond:
+                candidates = list(self._objs.values())
+        return [obj for obj in candidates if _matches(obj, attributes)]
+
+    def page(self, cls: type, after: Optional[str],
+             limit: int) -> List[Any]:
+        """ At most limit stored objects ordered by id after the cursor
+        """
+        with self._cond:
+            ids = sorted(obj_id for obj_id in self._objs
+                         if after is None or obj_id > after)
+            return [self._objs[obj_id] for obj_id in ids[:limit]]
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+""" Storage backends module
+
+Base.save/remove/get/search/count/all and load_from_file delegate to
+the backend selected by the BASE_STORAGE environment variable:
+  - `file` (default): models.base.FileStorage, the DATA dict
+    persisted to .db_<Class> files
+  - `sqlite`: SQLiteStorage, one table per class in a SQLite database
+    in WAL mode, shared by every process using the same file
+"""
+from contextlib import contextmanager
+from itertools import groupby
+from os import getenv
+from typing import Any, Iterable, Iterator, List, Optional
+import json
+import re
+import sqlite3
+import threading
+
+
+class Storage():
+    """ Interface of the storage backends of Base models
+    """
+
+    def load(self, cls: type):
+        """ Make the stored objects of cls available
+        """
+        raise NotImplementedError()
+
+    def save(self, obj: Any):
+        """ Insert or update an object
+        """
+        raise NotImplementedError()
+
+    def remove(self, obj: Any):
+        """ Delete an object if it is stored
+        """
+        raise NotImplementedError()
+
+    def count(self, cls: type) -> int:
+        """ Number of stored objects of cls
+        """
+        raise NotImplementedError()
+
+    def get(self, cls: type, id: str) -> Optional[Any]:
+        """ Stored object of cls with this id, or None
+        """
+        raise NotImplementedError()
+
+    def search(self, cls: type, attributes: dict) -> List[Any]:
+        """ Stored objects of cls whose attributes equal the given ones
+        """
+        raise NotImplementedError()
+
+    def page(self, cls: type, after: Optional[str],
+             limit: int) -> List[Any]:
+        """ At most limit stored objects of cls, ordered by id, whose id
+        sorts after the cursor `after` (from the first when None)
+        """
+        raise NotImplementedError()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """ Group the writes of the current thread made in the block
+        into a single flush at exit
+        """
+        yield
+
+    def bulk_save(self, objs: Iterable[Any]):
+        """ Insert or update several objects in one batch
+        """
+        with self.batch():
+            for obj in objs:
+                self.save(obj)
+
+    def bulk_remove(self, objs: Iterable[Any]):
+        """ Delete several objects in one batch
+        """
+        with self.batch():
+            for obj in objs:
+                self.remove(obj)
+
+
+def _matches(obj: Any, attributes: dict) -> bool:
+    """ Whether every attribute of obj equals the given value
+    """
+    for k, v in attributes.items():
+        if getattr(obj, k) != v:
+            return False
+    return True
+
+
+class SQLiteStorage(Storage):
+    """ Storage of each class in a SQLite table
+
+    Objects are stored as their to_json(True) document, next to one
+    indexed column per attribute listed in the INDEXES of the class so
+    that equality searches on them run as indexed queries.
+    """
+
+    def __init__(self, db_path: str = None):
+        """ Use the database at db_path, BASE_SQLITE_PATH by default
+        """
+        self.db_path = db_path or getenv('BASE_SQLITE_PATH', '.db.sqlite3')
+        self._local = threading.local()
+        self._tables = set()
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread, opened in WAL mode
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _table(cls: type) -> str:
+        """ Quoted table name of cls
+        """
+        if not re.match(r'^\w+$', cls.__name__):
+            raise ValueError("Invalid class name: {}".format(cls.__name__))
+        return '"{}"'.format(cls.__name__)
+
+    def _ensure_table(self, cls: type) -> str:
+        """ Create the table and indexes of cls if needed
+        """
+        table = self._table(cls)
+        if cls in self._tables:
+            return table
+        with self._lock:
+            conn = self._connection()
+            columns = "".join(', "{}"'.format(attr) for attr in cls.INDEXES)
+            conn.execute('CREATE TABLE IF NOT EXISTS {} '
+                         '(id TEXT PRIMARY KEY, data TEXT NOT NULL{})'
+                         .format(table, columns))
+            for attr in cls.INDEXES:
+                conn.execute('CREATE INDEX IF NOT EXISTS "{0}_{1}" '
+                             'ON {2} ("{1}")'
+                             .format(cls.__name__, attr, table))
+            self._tables.add(cls)
+        return table
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """ Run the writes of the block in one transaction, committed
+        (a single WAL sync) at exit or rolled back on error
+        """
+        conn = self._connection()
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = depth + 1
+        try:
+            yield
+        except BaseException:
+            self._local.depth = depth
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        self._local.depth = depth
+        if depth == 0:
+            conn.execute("COMMIT")
+
+    def _build(self, cls: type, rows: list) -> List[Any]:
+        """ Objects of cls from (data,) rows
+        """
+        return [cls(**json.loads(row[0])) for row in rows]
+
+    def load(self, cls: type):
+        """ Make the stored objects of cls available
+        """
+        self._ensure_table(cls)
+
+    def save(self, obj: Any):
+        """ Insert or update an object, keeping its position in the
+        insertion order
+        """
+        self.bulk_save((obj,))
+
+    def bulk_save(self, objs: Iterable[Any]):
+        """ Insert or update several objects in one transaction
+        """
+        with self.batch():
+            for cls, group in groupby(objs, lambda obj: obj.__class__):
+                table = self._ensure_table(cls)
+                names = "".join(', "{}"'.format(attr)
+                                for attr in cls.INDEXES)
+                updates = "".join(', "{0}" = excluded."{0}"'.format(attr)
+                                  for attr in cls.INDEXES)
+                self._connection().executemany(
+                    'INSERT INTO {} (id, data{}) VALUES (?, ?{}) '
+                    'ON CONFLICT(id) DO UPDATE SET data = excluded.data{}'
+                    .format(table, names, ", ?" * len(cls.INDEXES),
+                            updates),
+                    ([obj.id, json.dumps(obj.to_json(True))] +
+                     [getattr(obj, attr, None) for attr in cls.INDEXES]
+                     for obj in group)
+                )
+
+    def remove(self, obj: Any):
+        """ Delete an object if it is stored
+        """
+        self.bulk_remove((obj,))
+
+    def bulk_remove(self, objs: Iterable[Any]):
+        """ Delete several objects in one transaction
+        """
+        with self.batch():
+            for cls, group in groupby(objs, lambda obj: obj.__class__):
+                table = self._ensure_table(cls)
+                self._connection().executemany(
+                    'DELETE FROM {} WHERE id = ?'.format(table),
+                    ((obj.id,) for obj in group)
+                )
+
+    def count(self, cls: type) -> int:
+        """ Number of stored objects of cls
+        """
+        table = self._ensure_table(cls)
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM {}'.format(table)
+        ).fetchone()[0]
+
+    def get(self, cls: type, id: str) -> Optional[Any]:
+        """ Stored object of cls with this id, or None
+        """
+        table = self._ensure_table(cls)
+        rows = self._connection().execute(
+            'SELECT data FROM {} WHERE id = ?'.format(table), (id,)
+        ).fetchall()
+        objs = self._build(cls, rows)
+        return objs[0] if objs else None
+
+    def search(self, cls: type, attributes: dict) -> List[Any]:
+        """ Stored objects of cls whose attributes equal the given ones;
+        id and indexed attributes are filtered in SQL, the others on
+        the loaded objects
+        """
+        table = self._ensure_table(cls)
+        where = []
+        params = []
+        for attr, value in attributes.items():
+            if attr != 'id' and attr not in cls.INDEXES:
+                continue
+            if value is not None and \
+                    not isinstance(value, (str, int, float)):
+                continue
+            where.append('"{}" IS ?'.format(attr))
+            params.append(value)
+        query = 'SELECT data FROM {}'.format(table)
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        rows = self._connection().execute(query + ' ORDER BY rowid',
+                                          params).fetchall()
+        return [obj for obj in self._build(cls, rows)
+                if _matches(obj, attributes)]
+
+    def page(self, cls: type, after: Optional[str],
+             limit: int) -> List[Any]:
+        """ At most limit stored objects of cls, ordered by id, whose id
+        sorts after the cursor, read through the primary key index
+        """
+        table = self._ensure_table(cls)
+        rows = self._connection().execute(
+            'SELECT data FROM {} WHERE id > ? ORDER BY id LIMIT ?'
+            .format(table), ("" if after is None else after, limit)
+        ).fetchall()
+        return self._build(cls, rows)